@@ -0,0 +1,80 @@
+import sys
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+
+from calgary_osm.crs import PROJECTED_CRS
+
+# Buildings that never get an address
+NO_ADDRESS_BUILDINGS = {"garage"}
+
+
+def assign_addresses(outlines, addresses, max_distance=25):
+    """Find the building outline that each address point belongs to.
+
+    An address point inside an outline belongs to it. Otherwise (parcel
+    address points are usually between the house and the street) it belongs
+    to the nearest outline within max_distance meters, unless that outline
+    already contains an address point, because then it's probably the
+    neighbor's house. Garages never get an address.
+
+    Returns the position in outlines (or -1) and how it was assigned
+    ("inside", "nearest" or None) for every address.
+    """
+    eligible = np.flatnonzero(~outlines["building"].isin(NO_ADDRESS_BUILDINGS))
+    polygons = outlines.geometry.to_crs(PROJECTED_CRS).values[eligible]
+    points = addresses.geometry.to_crs(PROJECTED_CRS).values
+    tree = shapely.STRtree(polygons)
+
+    assigned = np.full(len(addresses), -1)
+    method = np.full(len(addresses), None, dtype=object)
+
+    point_idx, polygon_idx = tree.query(points, predicate="within")
+    # A point inside overlapping outlines goes to the first one
+    point_idx, first = np.unique(point_idx, return_index=True)
+    assigned[point_idx] = eligible[polygon_idx[first]]
+    method[point_idx] = "inside"
+
+    outside = np.flatnonzero(assigned == -1)
+    point_idx, polygon_idx = tree.query_nearest(
+        points[outside], max_distance=max_distance, all_matches=False
+    )
+    nearest = eligible[polygon_idx]
+    has_own_address = np.isin(nearest, assigned[assigned != -1])
+    assigned[outside[point_idx[~has_own_address]]] = nearest[~has_own_address]
+    method[outside[point_idx[~has_own_address]]] = "nearest"
+    return assigned, method
+
+
+def merge_addresses(outlines, addresses, assigned):
+    """Put the address tags on the outlines that got exactly one address.
+
+    Outlines with more than one address (duplexes, etc.) are left alone and
+    their address points are kept, like the ones that weren't assigned to
+    any outline. Returns the outlines and the remaining address points as
+    one GeoDataFrame.
+    """
+    tags = [c for c in addresses.columns if c.startswith("addr:")]
+    counts = np.bincount(assigned[assigned != -1], minlength=len(outlines))
+    single = (assigned != -1) & (counts[np.maximum(assigned, 0)] == 1)
+
+    address_tags = addresses.loc[single, tags].copy()
+    address_tags.index = outlines.index[assigned[single]]
+    merged = outlines.join(address_tags, how="left")
+
+    remaining = addresses.loc[~single, tags].copy()
+    remaining[merged.geometry.name] = addresses.geometry[~single].to_crs(merged.crs)
+
+    print(
+        f"Merged {single.sum()} addresses into outlines, "
+        f"{(counts > 1).sum()} outlines have more than one address, "
+        f"{(assigned == -1).sum()} addresses aren't near an outline",
+        file=sys.stderr,
+    )
+    return gpd.GeoDataFrame(
+        pd.concat([merged, remaining], ignore_index=True),
+        geometry=merged.geometry.name,
+        crs=merged.crs,
+    )
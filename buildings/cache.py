@@ -0,0 +1,105 @@
+import hashlib
+import json
+from pathlib import Path
+
+import geopandas as gpd
+
+
+def file_hash(path, chunk_size=1 << 20):
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def fingerprint(path, previous=None):
+    # mtime and size are checked first and the file is only re-hashed when
+    # they changed, so a touched but identical file doesn't invalidate the cache
+    stat = Path(path).stat()
+    fp = {"mtime": stat.st_mtime, "size": stat.st_size}
+    if (
+        previous
+        and previous.get("mtime") == fp["mtime"]
+        and previous.get("size") == fp["size"]
+    ):
+        fp["hash"] = previous["hash"]
+    else:
+        fp["hash"] = file_hash(path)
+    return fp
+
+
+def meta_path(cache_path):
+    cache_path = Path(cache_path)
+    return cache_path.with_name(cache_path.name + ".meta.json")
+
+
+def read_meta(cache_path):
+    try:
+        with open(meta_path(cache_path)) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def is_fresh(cache_path, sources=(), params=None):
+    """Check that cache_path was built from the current version of every source file."""
+    if not Path(cache_path).exists():
+        return False
+    meta = read_meta(cache_path)
+    if meta is None or meta.get("params") != params:
+        return False
+
+    fresh = True
+    changed = False
+    for source in sources:
+        source = str(source)
+        previous = meta["sources"].get(source)
+        if previous is None or not Path(source).exists():
+            return False
+        current = fingerprint(source, previous)
+        if current["hash"] != previous["hash"]:
+            fresh = False
+        elif current != previous:
+            changed = True
+        meta["sources"][source] = current
+    if fresh and changed:
+        # Save the new mtimes so the file isn't hashed again next time
+        write_meta(cache_path, meta)
+    return fresh
+
+
+def write_meta(cache_path, meta):
+    with open(meta_path(cache_path), "w") as f:
+        json.dump(meta, f, indent=2)
+
+
+def read_cache(cache_path, columns=None):
+    if columns is not None and "geometry" not in columns:
+        columns = [*columns, "geometry"]
+    return gpd.read_parquet(cache_path, columns=columns)
+
+
+def write_cache(gdf, cache_path, sources=(), params=None):
+    gdf.to_parquet(cache_path)
+    write_meta(
+        cache_path,
+        {
+            "params": params,
+            "sources": {str(source): fingerprint(source) for source in sources},
+        },
+    )
+
+
+def cached(cache_path, build, sources=(), params=None, columns=None, enabled=True):
+    """Return the GeoDataFrame cached in cache_path or build() and cache it.
+
+    The cache is rebuilt when any of the source files or params change.
+    """
+    if enabled and is_fresh(cache_path, sources, params):
+        return read_cache(cache_path, columns)
+    gdf = build()
+    write_cache(gdf, cache_path, sources, params)
+    if columns is not None:
+        gdf = gdf[[c for c in gdf.columns if c in columns or c == "geometry"]]
+    return gdf
@@ -0,0 +1,155 @@
+"""Compare two releases of the City's Buildings.geojson.
+
+Usage: python diff_snapshots.py Buildings_2023.geojson Buildings.geojson
+
+Outlines with the same building type and exactly the same geometry are
+unchanged and are matched by hashing them, without ever holding both files
+in memory. The rest is matched with a spatial index: an old and a new outline
+that overlap with an intersection over union of at least MIN_IOU are the same
+building (modified), new outlines that aren't matched are added and old ones
+are removed. Only the changes are written, split into neighborhoods and
+processed like outlines.py does, so added/ can be imported directly.
+"""
+
+import sys
+from argparse import ArgumentParser
+from pathlib import Path
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pyogrio
+import shapely
+
+from calgary_osm.crs import PROJECTED_CRS
+
+from export import partition_by_neighborhood, safe_filename, write_partitions
+from outlines import OUTPUT_DIR, download_neighborhoods, prepare_outlines, save
+from qa import make_valid
+
+CHUNK_SIZE = 50_000
+MIN_IOU = 0.5
+COLUMNS = ["bldg_code_desc"]
+
+
+def read_chunks(path):
+    # Streams the file once, reading rows=slice(...) would re-parse it from
+    # the start for every chunk
+    with pyogrio.open_arrow(
+        path, columns=COLUMNS, batch_size=CHUNK_SIZE, use_pyarrow=True
+    ) as (meta, reader):
+        geometry_name = meta["geometry_name"] or "wkb_geometry"
+        for batch in reader:
+            df = batch.to_pandas()
+            geometry = gpd.GeoSeries.from_wkb(df.pop(geometry_name), crs=meta["crs"])
+            yield gpd.GeoDataFrame(df, geometry=geometry.values, crs=meta["crs"])
+
+
+def outline_hashes(gdf):
+    # Normalized so that outlines that start at a different node are the same
+    df = pd.DataFrame(
+        {
+            "code": gdf["bldg_code_desc"].str.strip(),
+            "geometry": shapely.to_wkb(shapely.normalize(gdf.geometry.values)),
+        }
+    )
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+
+def read_changed(path, unchanged):
+    """Read the outlines from path whose hash isn't in unchanged."""
+    chunks = []
+    for gdf in read_chunks(path):
+        chunks.append(gdf[~np.isin(outline_hashes(gdf), unchanged)])
+    return pd.concat(chunks, ignore_index=True)
+
+
+def match_outlines(old, new, min_iou=MIN_IOU):
+    """Pair every new outline with the old outline it overlaps the most, if
+    their intersection over union is at least min_iou. Every old outline is
+    used at most once."""
+    old_polygons = make_valid(old.geometry.to_crs(PROJECTED_CRS).values)
+    new_polygons = make_valid(new.geometry.to_crs(PROJECTED_CRS).values)
+    new_idx, old_idx = shapely.STRtree(old_polygons).query(
+        new_polygons, predicate="intersects"
+    )
+    intersection = shapely.area(
+        shapely.intersection(new_polygons[new_idx], old_polygons[old_idx])
+    )
+    union = (
+        shapely.area(new_polygons[new_idx])
+        + shapely.area(old_polygons[old_idx])
+        - intersection
+    )
+    pairs = pd.DataFrame({"new": new_idx, "old": old_idx, "iou": intersection / union})
+    pairs = pairs[pairs["iou"] >= min_iou].sort_values("iou", ascending=False)
+    pairs = pairs.drop_duplicates("new").drop_duplicates("old")
+    return pairs["new"].to_numpy(), pairs["old"].to_numpy()
+
+
+def diff_snapshots(old_path, new_path, output, neighborhoods):
+    """Write the outlines of new_path that were added or modified and the
+    outlines of old_path that were removed to output, one file per
+    neighborhood. Returns the number of changes per neighborhood."""
+    old_hashes = np.concatenate([outline_hashes(gdf) for gdf in read_chunks(old_path)])
+    new_hashes = np.concatenate([outline_hashes(gdf) for gdf in read_chunks(new_path)])
+    unchanged = np.intersect1d(old_hashes, new_hashes)
+
+    old = read_changed(old_path, unchanged)
+    new = read_changed(new_path, unchanged)
+    new_matched, old_matched = match_outlines(old, new)
+    is_modified = np.zeros(len(new), dtype=bool)
+    is_modified[new_matched] = True
+    is_removed = np.ones(len(old), dtype=bool)
+    is_removed[old_matched] = False
+
+    print(
+        f"{np.isin(new_hashes, unchanged).sum()} unchanged, "
+        f"{(~is_modified).sum()} added, {is_modified.sum()} modified, "
+        f"{is_removed.sum()} removed",
+        file=sys.stderr,
+    )
+
+    changes = {
+        "added": new[~is_modified],
+        "modified": new[is_modified],
+        "removed": old[is_removed],
+    }
+    counts = {}
+    for change, gdf in changes.items():
+        counts[change] = {}
+        if gdf.empty:
+            continue
+        gdf = prepare_outlines(gdf)
+        partitions, outside = partition_by_neighborhood(gdf, neighborhoods)
+        partitions["outside_calgary"] = outside
+        (output / change).mkdir(exist_ok=True, parents=True)
+        # Only the neighborhoods that changed get a file
+        files = [
+            (output / change / f"{safe_filename(name)}.geojson", positions)
+            for name, positions in sorted(partitions.items())
+            if len(positions)
+        ]
+        write_partitions(gdf, files, save)
+        counts[change] = {
+            name: len(positions) for name, positions in partitions.items()
+        }
+
+    summary = pd.DataFrame(counts).fillna(0).astype(int)
+    summary = summary[summary.sum(axis=1) > 0].sort_values("added", ascending=False)
+    return summary
+
+
+if __name__ == "__main__":
+    args = ArgumentParser()
+    args.add_argument("old", type=Path)
+    args.add_argument("new", type=Path)
+    args.add_argument("--output", type=Path, default=OUTPUT_DIR / "diff")
+    args = args.parse_args()
+    summary = diff_snapshots(
+        args.old,
+        args.new,
+        args.output,
+        download_neighborhoods("Calgary, Alberta, Canada"),
+    )
+    print(summary.to_string())
@@ -0,0 +1,139 @@
+import hashlib
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+def safe_filename(name):
+    return name.replace("/", "_")
+
+
+MANIFEST_FILENAME = "manifest.json"
+
+
+def fingerprint(gdf):
+    """Hash of the columns, tags and geometries of gdf, ignoring its index."""
+    df = pd.DataFrame(gdf.drop(columns=gdf.geometry.name))
+    df["geometry"] = gdf.geometry.to_wkb(hex=True)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(json.dumps(list(df.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def read_manifest(directory):
+    try:
+        return json.loads((directory / MANIFEST_FILENAME).read_text())
+    except FileNotFoundError:
+        return {}
+
+
+def write_manifest(directory, manifest):
+    (directory / MANIFEST_FILENAME).write_text(
+        json.dumps(manifest, indent=1, sort_keys=True)
+    )
+
+
+def is_unchanged(manifest, path, digest):
+    return manifest.get(str(path)) == digest and path.exists()
+
+
+def partition_by_neighborhood(gdf, neighborhoods):
+    """Assign every feature to the neighborhood(s) it intersects in one pass.
+
+    Returns a dict of neighborhood name -> positions of its features in gdf
+    and an array with the positions of the features outside every neighborhood.
+    """
+    feature_idx, neighborhood_idx = neighborhoods.sindex.query(
+        gdf.geometry.values, predicate="intersects"
+    )
+    names = neighborhoods["name"].to_numpy()[neighborhood_idx]
+    # Buildings that straddle a boundary end up in both neighborhoods
+    partitions = {
+        name: np.unique(feature_idx[positions])
+        for name, positions in pd.Series(names).groupby(names).indices.items()
+    }
+    outside = np.setdiff1d(np.arange(len(gdf)), feature_idx)
+    return partitions, outside
+
+
+def write_partitions(gdf, files, save, threads=8, manifest=None, incremental=False):
+    """Write gdf.iloc[positions] to every path in files concurrently.
+
+    files is a list of (path, positions) pairs. If manifest (a dict of path ->
+    fingerprint) is given, it's updated with the fingerprint of every file.
+    With incremental, files whose features have the same fingerprint as in
+    manifest aren't written again.
+    """
+
+    def write(path, positions):
+        start = time.perf_counter()
+        part = gdf.iloc[positions]
+        if manifest is not None:
+            digest = fingerprint(part)
+            if incremental and is_unchanged(manifest, path, digest):
+                return path, None, time.perf_counter() - start
+            manifest[str(path)] = digest
+        save(part, path)
+        return path, len(positions), time.perf_counter() - start
+
+    start = time.perf_counter()
+    timings = []
+    unchanged = 0
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        futures = [pool.submit(write, path, positions) for path, positions in files]
+        for future in as_completed(futures):
+            path, count, seconds = future.result()
+            if count is None:
+                unchanged += 1
+                continue
+            print(f"Saved {path} ({count} features) in {seconds:.2f}s", file=sys.stderr)
+            timings.append((path, count, seconds))
+    print(
+        f"Saved {len(timings)} files in {time.perf_counter() - start:.2f}s"
+        + (f", {unchanged} unchanged" if incremental else ""),
+        file=sys.stderr,
+    )
+    return timings
+
+
+def report_changes(directory, changed):
+    if changed:
+        names = sorted(Path(path).stem for path in changed)
+        print(f"Changed in {directory}: {', '.join(names)}", file=sys.stderr)
+    else:
+        print(f"Nothing changed in {directory}", file=sys.stderr)
+
+
+def export_by_neighborhood(
+    gdf,
+    neighborhoods,
+    neighborhood_dir,
+    outside_filename,
+    save,
+    threads=8,
+    incremental=False,
+):
+    """Write the features in every neighborhood to its own file in
+    neighborhood_dir. With incremental, only the files whose features
+    changed since the last export are written."""
+    partitions, outside = partition_by_neighborhood(gdf, neighborhoods)
+    neighborhood_dir.mkdir(exist_ok=True, parents=True)
+    files = [
+        (neighborhood_dir / f"{safe_filename(name)}.geojson", positions)
+        for name, positions in sorted(partitions.items())
+    ]
+    files.append((outside_filename, outside))
+    # The manifest is rewritten by full exports too, otherwise the next
+    # incremental export would compare against an older export's files
+    manifest = read_manifest(neighborhood_dir) if incremental else {}
+    timings = write_partitions(gdf, files, save, threads, manifest, incremental)
+    write_manifest(neighborhood_dir, manifest)
+    if incremental:
+        report_changes(neighborhood_dir, [path for path, _, _ in timings])
+    return timings
@@ -1,16 +1,29 @@
 from pathlib import Path
+import json
 import os
 
+from josm import BOUNDS_FILENAME, LAYERS, file_bounds
+
 with open("open_template.py") as f:
     template = f.read()
 
 Path("./open/").mkdir(exist_ok=True, parents=True)
 
+# Bounding box of every file, so opening a neighborhood doesn't have to read them
+for layer in LAYERS:
+    bounds = {}
+    for file in Path("buildings", layer).glob("*.geojson"):
+        bounds[file.stem] = file_bounds(file)
+    with open(Path("buildings", layer, BOUNDS_FILENAME), "w") as f:
+        json.dump(bounds, f, indent=1, sort_keys=True)
+
 for file in Path("buildings/neighborhoods").glob("*.geojson"):
     neighborhood = file.stem
     with open(f"open/{neighborhood}.command", "w") as f:
-        contents = template.replace("{{neighborhood}}", neighborhood).replace(
-            "{{folder}}", str(Path("buildings").absolute())
+        contents = (
+            template.replace("{{neighborhood}}", neighborhood)
+            .replace("{{folder}}", str(Path("buildings").absolute()))
+            .replace("{{code}}", str(Path().absolute()))
         )
         f.write(contents)
     # add exec permission
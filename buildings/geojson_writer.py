@@ -0,0 +1,74 @@
+import json
+
+import numpy as np
+import shapely
+
+CHUNK_SIZE = 10_000
+
+
+def to_json_value(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+def iter_features(gdf, drop_nulls=True, precision=None, separators=(",", ":")):
+    """Yield every row of gdf as a serialized GeoJSON Feature, CHUNK_SIZE rows at a time."""
+    geometry_name = gdf.geometry.name
+    columns = [c for c in gdf.columns if c != geometry_name]
+    for start in range(0, len(gdf), CHUNK_SIZE):
+        chunk = gdf.iloc[start : start + CHUNK_SIZE]
+
+        geometries = chunk.geometry.to_numpy()
+        if precision is not None:
+            geometries = shapely.transform(
+                geometries, lambda coords: np.round(coords, precision)
+            )
+        geometries = shapely.to_geojson(geometries)
+
+        values = chunk[columns].astype(object).to_numpy()
+        nulls = chunk[columns].isna().to_numpy()
+        for geometry, row, row_nulls in zip(geometries, values, nulls):
+            if drop_nulls:
+                properties = {
+                    column: value
+                    for column, value, null in zip(columns, row, row_nulls)
+                    if not null
+                }
+            else:
+                properties = {
+                    column: None if null else value
+                    for column, value, null in zip(columns, row, row_nulls)
+                }
+            properties = json.dumps(
+                properties,
+                ensure_ascii=False,
+                separators=separators,
+                default=to_json_value,
+            )
+            # shapely already returns the geometry as JSON
+            yield (
+                f'{{"type":"Feature","properties":{properties},'
+                f'"geometry":{geometry or "null"}}}'
+            )
+
+
+def write_geojson(gdf, filename, drop_nulls=True, precision=None, compact=True):
+    """Write gdf as a GeoJSON FeatureCollection one feature at a time.
+
+    Null properties are left out when drop_nulls is set and coordinates are
+    rounded to precision decimal places if it's given.
+    """
+    if gdf.crs is not None and not gdf.crs.equals("EPSG:4326"):
+        gdf = gdf.to_crs("EPSG:4326")
+    separators = (",", ":") if compact else (", ", ": ")
+    newline = "" if compact else "\n"
+    with open(filename, "w", encoding="utf-8") as f:
+        f.write(f'{{"type":"FeatureCollection","features":[{newline}')
+        for i, feature in enumerate(
+            iter_features(gdf, drop_nulls, precision, separators)
+        ):
+            if i:
+                f.write(f",{newline}")
+            f.write(feature)
+        f.write(f"{newline}]}}\n")
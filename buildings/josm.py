@@ -0,0 +1,186 @@
+"""Open neighborhoods in JOSM through its Remote Control.
+
+https://josm.openstreetmap.de/wiki/Help/RemoteControlCommands
+
+Usage: python josm.py [--folder buildings] NEIGHBORHOOD [NEIGHBORHOOD ...]
+
+Enabling the imagery is sent at the same time as the other requests, which
+are sent in order so JOSM's layers always end up in the same order. They run
+in threads with one shared requests session (so connections to JOSM are
+reused) instead of an async HTTP library, to avoid another dependency.
+Bounding boxes come from the index that gen_open.py writes, files that
+aren't in it or that changed after it was written are read instead.
+"""
+
+import asyncio
+import json
+import sys
+from argparse import ArgumentParser
+from pathlib import Path
+
+import numpy as np
+import pyogrio
+import requests
+from requests.adapters import HTTPAdapter
+
+JOSM_URL = "http://127.0.0.1:8111"
+BOUNDS_FILENAME = "bounds.json"
+LAYERS = ["addresses", "neighborhoods"]
+
+# Margin around the neighborhood's features when downloading OSM data
+DELTA_LAT = 0.0001
+DELTA_LON = 0.00005
+
+
+class JosmClient:
+    def __init__(
+        self, url=JOSM_URL, retries=30, retry_delay=1, connections=4, timeout=60
+    ):
+        self.url = url
+        self.retries = retries
+        self.retry_delay = retry_delay
+        # Seconds to wait for a response, so a hung JOSM doesn't block forever
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_maxsize=connections))
+
+    def close(self):
+        self.session.close()
+
+    async def request(self, command, description, **params):
+        # JOSM refuses connections until it has started
+        for attempt in range(self.retries):
+            try:
+                response = await asyncio.to_thread(
+                    self.session.get,
+                    f"{self.url}/{command}",
+                    params=params,
+                    timeout=self.timeout,
+                )
+                break
+            except requests.ConnectionError:
+                if attempt == self.retries - 1:
+                    raise
+                await asyncio.sleep(self.retry_delay)
+        print(f"{description}: {response.status_code} - {response.reason}")
+        return response
+
+    async def enable_imagery(self, imagery_id="Bing"):
+        return await self.request(
+            "imagery", f"Enabling {imagery_id} imagery", id=imagery_id
+        )
+
+    async def open_file(self, path):
+        return await self.request(
+            "open_file", f"Opening {path}", filename=str(Path(path).absolute())
+        )
+
+    async def load_and_zoom(self, bbox, **params):
+        left, bottom, right, top = bbox
+        return await self.request(
+            "load_and_zoom",
+            f"Downloading OSM data for bbox {bbox}",
+            left=left,
+            bottom=bottom,
+            right=right,
+            top=top,
+            **params,
+        )
+
+
+def file_bounds(path):
+    """Bounding box of the features in a GeoJSON file, None if it has none."""
+    _, bounds = pyogrio.read_bounds(path)
+    if bounds.shape[1] == 0:
+        return None
+    return [
+        float(np.nanmin(bounds[0])),
+        float(np.nanmin(bounds[1])),
+        float(np.nanmax(bounds[2])),
+        float(np.nanmax(bounds[3])),
+    ]
+
+
+def read_bounds(folder):
+    """Read the bounding box index of every layer in folder, layers without
+    one get an empty index."""
+    bounds = {}
+    for layer in LAYERS:
+        try:
+            bounds[layer] = json.loads((folder / layer / BOUNDS_FILENAME).read_text())
+        except FileNotFoundError:
+            bounds[layer] = {}
+    return bounds
+
+
+def neighborhood_bbox(folder, bounds, neighborhood):
+    """Bounding box of the neighborhood's files plus a margin, None if they
+    have no features."""
+    boxes = []
+    for layer in LAYERS:
+        file = folder / layer / f"{neighborhood}.geojson"
+        if not file.exists():
+            continue
+        # outlines.py rewrites the files without updating the index
+        index = folder / layer / BOUNDS_FILENAME
+        if (
+            neighborhood in bounds[layer]
+            and file.stat().st_mtime <= index.stat().st_mtime
+        ):
+            boxes.append(bounds[layer][neighborhood])
+        else:
+            boxes.append(file_bounds(file))
+    boxes = [box for box in boxes if box is not None]
+    if not boxes:
+        return None
+    return [
+        min(box[0] for box in boxes) - DELTA_LON,
+        min(box[1] for box in boxes) - DELTA_LAT,
+        max(box[2] for box in boxes) + DELTA_LON,
+        max(box[3] for box in boxes) + DELTA_LAT,
+    ]
+
+
+async def open_neighborhood(josm, folder, bounds, neighborhood):
+    for layer in LAYERS:
+        file = folder / layer / f"{neighborhood}.geojson"
+        if file.exists():
+            await josm.open_file(file)
+    bbox = neighborhood_bbox(folder, bounds, neighborhood)
+    if bbox is None:
+        print(f"No features in {neighborhood}, not downloading OSM data")
+        return
+    await josm.load_and_zoom(
+        bbox,
+        new_layer="true",
+        layer_name="osm",
+        search="-type:relation building:",
+    )
+
+
+async def open_neighborhoods(folder, neighborhoods, url=JOSM_URL):
+    """Open the files and download the OSM data of every neighborhood, one
+    neighborhood after another."""
+    bounds = read_bounds(folder)
+    josm = JosmClient(url)
+    try:
+        imagery = asyncio.create_task(josm.enable_imagery())
+        for neighborhood in neighborhoods:
+            await open_neighborhood(josm, folder, bounds, neighborhood)
+        await imagery
+    finally:
+        josm.close()
+
+
+if __name__ == "__main__":
+    args = ArgumentParser()
+    args.add_argument("neighborhoods", nargs="+")
+    args.add_argument("--folder", type=Path, default=Path("buildings"))
+    args.add_argument("--url", default=JOSM_URL)
+    args = args.parse_args()
+    try:
+        asyncio.run(open_neighborhoods(args.folder, args.neighborhoods, args.url))
+    except requests.ConnectionError:
+        sys.exit(f"Couldn't connect to JOSM at {args.url}, is Remote Control enabled?")
+    except requests.Timeout:
+        sys.exit(f"JOSM at {args.url} didn't respond")
@@ -0,0 +1,55 @@
+import sys
+
+import numpy as np
+import pandas as pd
+import shapely
+
+from calgary_osm.crs import PROJECTED_CRS
+from qa import make_valid
+
+
+def classify_outlines(outlines, osm, min_iou=0.5, min_overlap_area=1):
+    """Compare every outline to the OSM buildings it overlaps.
+
+    An outline is "mapped" if it has an intersection over union of at least
+    min_iou with an OSM building, "conflicting" if it overlaps an OSM building
+    by more than min_overlap_area square meters but doesn't match any of them
+    that well and "new" otherwise. Returns an array with the class of every
+    outline.
+    """
+    polygons = make_valid(outlines.geometry.to_crs(PROJECTED_CRS).values)
+    osm_polygons = make_valid(osm.geometry.to_crs(PROJECTED_CRS).values)
+    tree = shapely.STRtree(osm_polygons)
+    outline_idx, osm_idx = tree.query(polygons, predicate="intersects")
+
+    intersection = shapely.area(
+        shapely.intersection(polygons[outline_idx], osm_polygons[osm_idx])
+    )
+    union = (
+        shapely.area(polygons[outline_idx])
+        + shapely.area(osm_polygons[osm_idx])
+        - intersection
+    )
+    pairs = pd.DataFrame(
+        {
+            "outline": outline_idx,
+            "iou": intersection / union,
+            "overlap": intersection > min_overlap_area,
+        }
+    ).groupby("outline")
+    best_iou = pairs["iou"].max().reindex(range(len(outlines)), fill_value=0)
+    overlaps = pairs["overlap"].any().reindex(range(len(outlines)), fill_value=False)
+
+    classes = np.where(
+        best_iou.to_numpy() >= min_iou,
+        "mapped",
+        np.where(overlaps.to_numpy(), "conflicting", "new"),
+    )
+    counts = pd.Series(classes).value_counts()
+    print(
+        f"{counts.get('new', 0)} new outlines, "
+        f"{counts.get('mapped', 0)} already mapped in OSM, "
+        f"{counts.get('conflicting', 0)} conflicting with OSM buildings",
+        file=sys.stderr,
+    )
+    return classes
@@ -1,17 +1,33 @@
+import sys
+
 import pandas as pd
 
 import geopandas as gpd
-import osmnx as ox
+
+from calgary_osm import features
+from calgary_osm.street_names import (
+    OSM_STREET_NAMES,
+    STREET_TYPES,
+    coc_street_names,
+    join_key,
+    join_keys,
+    strip_block_prefix,
+)
+from street_distance import distance_to_named_street
 
 FILENAME = "Parcel_Address"
 IN_FILENAME = FILENAME + ".csv"
 OUT_FILENAME = FILENAME + ".geojson"
 
+# Addresses further than this (in meters) from any street with the same name
+# are saved to Parcel_Address_far_from_street.geojson
+MAX_STREET_DISTANCE = 150
+
 
 overpass_url = "http://overpass-api.de/api/interpreter"
 
-def fetch_street_names():
-    osm = ox.features_from_place(
+def fetch_streets():
+    osm = features.features_from_place(
         "Calgary, Alberta, Canada",
         {
             "highway": [
@@ -33,11 +49,11 @@ def fetch_street_names():
     # filter out streets without name
     osm = osm[osm["name"].notnull()]
     osm = osm.loc[osm.index.get_level_values("element") == "way"]
-    sorted_streets = sorted(osm["name"].unique())
-    return sorted_streets
+    return osm[["name", "geometry"]]
 
 
-osm_street_names = fetch_street_names()
+streets = fetch_streets()
+osm_street_names = sorted(streets["name"].unique())
 # print(len(osm_street_names), "street names")
 for name in osm_street_names:
     if name.rsplit(" ", 1)[-1] not in ["SW", "SE", "NW", "NE"] and name not in [
@@ -49,58 +65,6 @@ for name in osm_street_names:
         pass
 
 
-# https://data.calgary.ca/Base-Maps/Parcel-Address/9zvu-p8uz/about_data
-street_types = {
-    "AL": "Alley",
-    "AV": "Avenue",
-    "BA": "Bay",
-    "BV": "Boulevard",
-    "CA": "Cape",
-    "CE": "Centre",
-    "CI": "Circle",
-    "CL": "Close",
-    "CM": "Common",
-    "CO": "Court",
-    "CR": "Crescent",
-    "CV": "Cove",
-    "DR": "Drive",
-    "GA": "Gate",
-    "GD": "Gardens",
-    "GR": "Green",
-    "GV": "Grove",
-    "HE": "Heath",
-    "HI": "Highway",
-    "HL": "Hill",
-    "HT": "Heights",
-    "IS": "Island",
-    "LD": "Landing",
-    "LI": "Link",
-    "LN": "Lane",
-    "ME": "Mews",
-    "MR": "Manor",
-    "MT": "Mount",
-    "PA": "Park",
-    "PH": "Path",
-    "PL": "Place",
-    "PR": "Parade",
-    "PS": "Passage",
-    "PT": "Point",
-    "PY": "Parkway",
-    "PZ": "Plaza",
-    "RD": "Road",
-    "RI": "Rise",
-    "RO": "Row",
-    "SQ": "Square",
-    "ST": "Street",
-    "TC": "Terrace",
-    "TR": "Trail",
-    "VI": "Villas",
-    "VW": "View",
-    "WK": "Walk",
-    "WY": "Way",
-}
-
-
 # df = pd.read_csv("Parcel_Address_20250127.csv", nrows=200)
 df = pd.read_csv(IN_FILENAME)
 # print(df.columns)
@@ -126,15 +90,13 @@ if not all(df["STREET_QUAD"].isin(["SW", "SE", "NW", "NE"])):
         "STREET_QUAD is not 'SW', 'SE', 'NW', 'NE'", df["STREET_QUAD"].unique()
     )
 
-# check all STREE_TYPE is in street_types
-if not all(df["STREET_TYPE"].isin(street_types.keys())):
-    diff = set(df["STREET_TYPE"].unique()) - street_types.keys()
+# check all STREE_TYPE is in STREET_TYPES
+if not all(df["STREET_TYPE"].isin(STREET_TYPES.keys())):
+    diff = set(df["STREET_TYPE"].unique()) - STREET_TYPES.keys()
     raise ValueError(
-        "STREET_TYPE is not in street_types: " + ", ".join(list(sorted(list((diff)))))
+        "STREET_TYPE is not in STREET_TYPES: " + ", ".join(list(sorted(list((diff)))))
     )
 # print(df["STREET_TYPE"].value_counts())
-# Expand street abbreviations
-df["STREET_TYPE"] = df["STREET_TYPE"].map(street_types)
 
 
 # print(df["HOUSE_ALPHA"].unique())
@@ -148,20 +110,9 @@ df.rename(
 # df["addr:housenumber"] = df["HOUSE_NUMBER"].astype(str) + df["HOUSE_ALPHA"].astype(str).replace("nan", "")
 # df.drop(columns=["HOUSE_NUMBER", "HOUSE_ALPHA"], inplace=True)
 
-for i, name in enumerate(df["STREET_NAME"]):
-    if name.startswith("ST "):
-        if name.startswith("ST MORITZ"):
-            df.at[i, "STREET_NAME"] = "St. Moritz" + name[len("ST MORITZ") :]
-        elif name.startswith("ST MONICA"):
-            df.at[i, "STREET_NAME"] = "St. Monica" + name[len("ST MONICA") :]
-        else:
-            df.at[i, "STREET_NAME"] = "Saint " + name[3:]
-    elif name.startswith("TWELVE MI COULEE"):
-        name = name.replace("TWELVE MI COULEE", "Twelve Mile Coulee")
-    if name.startswith("MT "):
-        df.at[i, "STREET_NAME"] = "Mount " + name[3:]
-df["addr:street"] = (
-    df["STREET_NAME"].str.title() + " " + df["STREET_TYPE"] + " " + df["STREET_QUAD"]
+# Expand street abbreviations and special cases
+df["addr:street"] = coc_street_names(
+    df["STREET_NAME"], df["STREET_TYPE"], df["STREET_QUAD"]
 )
 
 # df.drop(["longitude", "latitude"], axis=1, inplace=True)
@@ -195,45 +146,28 @@ gdf.drop(
 # gdf.to_file(FILENAME + "_osm.geojson", driver="GeoJSON")
 
 
-osm_names = {
-    "centre street ne": "Centre Street NE",
-    "centre street nw": "Centre Street NW",
-    "centre street se": "Centre Street SE",
-    "centre street sw": "Centre Street SW",
-    "centre avenue ne": "Centre Avenue NE",
-    "centre avenue nw": "Centre Avenue NW",
-    "centre avenue se": "Centre Avenue SE",
-    "centre avenue sw": "Centre Avenue SW",
-    "harvest hills boulevard ne": "Harvest Hills Boulevard NE",
-    "harvest hills boulevard nw": "Harvest Hills Boulevard NW",
-    "trans canada highway sw": "Trans-Canada Highway SW",
-    "trans canada highway nw": "Trans-Canada Highway NW",
-    "metis trail ne": "Métis Trail NE",
-    "metis trail nw": "Métis Trail NW",
-}
+# join key -> name of the street in OSM
+osm_names = {join_key(name): name for name in OSM_STREET_NAMES}
 for name in osm_street_names:
     # Remove numeric prefixes from names
-    for i in [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 20, 30, 40]:
-        prefix = f"{i}00 "
-        if name.startswith(prefix) and not (
-            name.startswith(prefix + "Avenue ") or name.startswith(prefix + "Street ")
-        ):
-            name = name[len(prefix) :]
-    if name.lower() in osm_names and osm_names[name.lower()] != name:
+    name = strip_block_prefix(name)
+    key = join_key(name)
+    if key in osm_names and osm_names[key] != name:
         print(name)
-        print(osm_names[name.lower()])
+        print(osm_names[key])
         print()
         pass
-    osm_names[name.lower()] = name
+    osm_names[key] = name
 
-coc = set(df["addr:street"].str.lower())
+df["_join_key"] = join_keys(df["addr:street"])
+coc = set(df["_join_key"])
 osm = set(osm_names.keys())
 missing = coc - osm
 # print("coc:", len(coc))
 # print("osm:", len(osm))
 # print("in coc, not in osm:", len(coc - osm))
 # save those to file as geojson
-not_in = df[df["addr:street"].str.lower().isin(missing)].copy()
+not_in = df[df["_join_key"].isin(missing)].drop(columns=["_join_key"])
 gdf = gpd.GeoDataFrame(
     not_in, geometry=gpd.points_from_xy(not_in["longitude"], not_in["latitude"])
 )
@@ -241,11 +175,29 @@ gdf.drop(["longitude", "latitude"], axis=1, inplace=True)
 gdf.set_crs("EPSG:4326", inplace=True)
 gdf.to_file(FILENAME + "_not_in_osm.geojson", driver="GeoJSON")
 
-in_osm = df[df["addr:street"].str.lower().isin(osm)].copy()
-in_osm["addr:street"] = in_osm["addr:street"].str.lower().map(osm_names)
+in_osm = df[df["_join_key"].isin(osm)].copy()
+in_osm["addr:street"] = in_osm["_join_key"].map(osm_names)
 gdf = gpd.GeoDataFrame(
     in_osm, geometry=gpd.points_from_xy(in_osm["longitude"], in_osm["latitude"])
 )
 gdf.drop(["longitude", "latitude"], axis=1, inplace=True)
 gdf.set_crs("EPSG:4326", inplace=True)
+
+# check that the street is actually near the address
+gdf["street_distance"] = distance_to_named_street(
+    gdf.geometry,
+    gdf["_join_key"],
+    streets.geometry,
+    join_keys(streets["name"], strip_block=True),
+    MAX_STREET_DISTANCE,
+).round(1)
+gdf.drop(columns=["_join_key"], inplace=True)
+far = gdf[gdf["street_distance"] > MAX_STREET_DISTANCE]
+print(
+    f"{len(far)} addresses further than {MAX_STREET_DISTANCE}m from their street",
+    file=sys.stderr,
+)
+far.to_file(FILENAME + "_far_from_street.geojson", driver="GeoJSON")
+
+gdf.drop(columns=["street_distance"], inplace=True)
 gdf.to_file(FILENAME + "_osm.geojson", driver="GeoJSON")
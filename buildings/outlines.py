@@ -2,181 +2,298 @@ import os
 from pathlib import Path
 import sys
 import time
-import json
 from argparse import ArgumentParser
 
 import geopandas as gpd
-from shapely.geometry import Polygon, MultiPolygon
-import osmnx as ox
-
-args = ArgumentParser()
-args.add_argument("--no-cache", action="store_true")
-args = args.parse_args()
-cache = not args.no_cache
+import numpy as np
+import shapely
+
+from address_assignment import assign_addresses, merge_addresses
+from cache import cached
+from export import export_by_neighborhood
+from geojson_writer import write_geojson
+from osm_conflation import classify_outlines
+from parallel import export_parallel
+from qa import check_outlines
+from vertex_reduction import reduce_vertices
+from calgary_osm import features
 
 FILENAME = Path("Buildings.geojson")
 ADDRESS_FILENAME = Path("Parcel_Address_osm.geojson")
 OUTPUT_DIR = Path("buildings")
 
+# Directories in OUTPUT_DIR with one file per neighborhood and the file that
+# gets the features outside of every neighborhood
+LAYERS = {
+    "neighborhoods": "outside_calgary.geojson",
+    "addresses": "coc_addresses_outside_calgary.geojson",
+    "qa": "qa_outside_calgary.geojson",
+    "new": "new_outside_calgary.geojson",
+    "mapped": "mapped_outside_calgary.geojson",
+    "conflicting": "conflicting_outside_calgary.geojson",
+    "merged": "merged_outside_calgary.geojson",
+}
+
 # caching files
-SHIFTED_FILENAME = FILENAME.with_name(FILENAME.stem + "_shifted.geojson")
-OSM_FILENAME = Path("osm_buildings.geojson")
-NEIGHBORHOODS_FILENAME = Path("calgary_neighborhoods.geojson")
-
-
-def shift_coords(geom, dlat=0.000004, dlon=-0.0000178):
-    def shift_polygon(polygon):
-        return Polygon([(x + dlon, y + dlat) for x, y in polygon.exterior.coords])
-
-    if geom.geom_type == "Polygon":
-        return shift_polygon(geom)
-    elif geom.geom_type == "MultiPolygon":
-        return MultiPolygon([shift_polygon(poly) for poly in geom.geoms])
-    return geom
-
-
-def expand_osm_tags(row):
-    row["building"] = {
-        "School Colleges": "school",
-        "Commercial": "commercial",
-        "Unclassified": "yes",
-        "Residential Garage": "garage",
-        "Residential Roof Outline": "residential",
-    }[row["bldg_code_desc"].strip()]
-    return row
-
-
-def load_shifted():
-    # if file exists then just load that
-    if SHIFTED_FILENAME.exists() and cache:
-        return gpd.read_file(SHIFTED_FILENAME)
-
-    gdf = gpd.read_file(FILENAME, columns=["bldg_code_desc"])
-    gdf = gdf[
-        gdf["bldg_code_desc"].isin(
-            [
-                # "Stadium",
-                # "Shopping Centres",
-                # "LRT Stations and Shelters",
-                # "Parking Garages",
-                # "Religious",
-                "School Colleges",
-                # "Miscellaneous (Park Buildings/Structures)",
-                # "Building Under Construction",
-                # "Bus Shelter",
-                "Commercial",
-                "Unclassified",
-                "Residential Garage",
-                "Residential Roof Outline",
-            ]
-        )
-    ]
+SHIFTED_FILENAME = FILENAME.with_name(FILENAME.stem + "_shifted.parquet")
+NEIGHBORHOODS_FILENAME = Path("calgary_neighborhoods.parquet")
+ADDRESS_CACHE_FILENAME = ADDRESS_FILENAME.with_suffix(".parquet")
+
+
+# Set from --no-cache when run as a script
+cache = True
+
+# OSM stores coordinates with 7 decimal places
+COORDINATE_PRECISION = 7
+
+# Offset between the City's outlines and Bing imagery, in degrees
+DLAT = 0.000004
+DLON = -0.0000178
+
+BUILDING_TAGS = {
+    "School Colleges": "school",
+    "Commercial": "commercial",
+    "Unclassified": "yes",
+    "Residential Garage": "garage",
+    "Residential Roof Outline": "residential",
+}
+
+
+def shift_coords(geometry, dlat=DLAT, dlon=DLON):
+    # Offsets every coordinate of every geometry (including holes) in one go
+    offset = np.array([dlon, dlat])
+    return shapely.transform(np.asarray(geometry), lambda coords: coords + offset)
+
+
+def build_shifted():
+    return prepare_outlines(gpd.read_file(FILENAME, columns=["bldg_code_desc"]))
+
+
+def prepare_outlines(gdf):
+    # Other categories are handled separately or not imported:
+    # "Stadium", "Shopping Centres", "LRT Stations and Shelters",
+    # "Parking Garages", "Religious", "Building Under Construction",
+    # "Bus Shelter", "Miscellaneous (Park Buildings/Structures)"
+    building = gdf["bldg_code_desc"].str.strip().map(BUILDING_TAGS)
+    gdf = gdf[building.notnull()].copy()
 
     # Expand OSM tags into separate columns
-    gdf = gdf.apply(expand_osm_tags, axis=1)
+    gdf["building"] = building[building.notnull()]
     gdf.drop(
         columns=["bldg_code_desc"],
         inplace=True,
     )
 
-    # Remove useless nodes
-    gdf["geometry"] = gdf["geometry"].simplify(
-        tolerance=0.000001, preserve_topology=True
-    )
+    # Remove useless nodes and square corners, in meters
+    gdf["geometry"] = reduce_vertices(gdf["geometry"], gdf["building"])
 
     # Adjust coordinates
-    gdf["geometry"] = gdf["geometry"].apply(shift_coords)
+    gdf["geometry"] = shift_coords(gdf["geometry"].values)
 
     gdf["source"] = "City of Calgary Digital Aerial Survey building roof outlines"
-
-    gdf.to_file(SHIFTED_FILENAME, driver="GeoJSON")
     return gdf
 
 
+def load_shifted(columns=None):
+    return cached(
+        SHIFTED_FILENAME,
+        build_shifted,
+        sources=[FILENAME],
+        params={
+            "dlat": DLAT,
+            "dlon": DLON,
+            "building_tags": BUILDING_TAGS,
+            # Bump to rebuild the cache when reduce_vertices() changes
+            "vertex_reduction": 1,
+        },
+        columns=columns,
+        enabled=cache,
+    )
+
+
 def download_neighborhoods(place: str) -> gpd.GeoDataFrame:
-    if NEIGHBORHOODS_FILENAME.exists() and cache:
-        return gpd.read_file(NEIGHBORHOODS_FILENAME)
+    return cached(
+        NEIGHBORHOODS_FILENAME,
+        lambda: fetch_neighborhoods(place),
+        params={"place": place},
+        enabled=cache,
+    )
+
 
-    gdf = ox.features.features_from_place(place, {"boundary": "administrative"})
+def fetch_neighborhoods(place: str) -> gpd.GeoDataFrame:
+    gdf = features.features_from_place(place, {"boundary": "administrative"})
     gdf = gdf[gdf["admin_level"] == "10"][gdf["boundary"] == "administrative"]
     gdf = gdf.loc[gdf.index.get_level_values("element") == "relation"][
         ["name", "geometry"]
     ]
-    gdf.to_file(NEIGHBORHOODS_FILENAME, driver="GeoJSON")
     return gdf
 
 
-def remove_null_properties(filename):
-    with open(filename, "r") as f:
-        data = json.load(f)
-    for feature in data["features"]:
-        feature["properties"] = {
-            k: v for k, v in feature["properties"].items() if v is not None
-        }
-    with open(filename, "w") as f:
-        json.dump(data, f)
+def download_osm_buildings(place: str) -> gpd.GeoDataFrame:
+    # No parquet cache that never expires, calgary_osm only reuses the query
+    # for a day (CALGARY_OSM_CACHE_TTL) so recently mapped buildings don't end
+    # up in new/
+    gdf = features.features_from_place(place, {"building": True})
+    gdf = gdf[gdf.geometry.geom_type.isin(["Polygon", "MultiPolygon"])]
+    return gdf[["building", "geometry"]]
+
+
+def load_addresses(columns=None):
+    return cached(
+        ADDRESS_CACHE_FILENAME,
+        lambda: gpd.read_file(ADDRESS_FILENAME),
+        sources=[ADDRESS_FILENAME],
+        columns=columns,
+        enabled=cache,
+    )
 
 
 def save(gdf, filename):
-    gdf.to_file(filename, driver="GeoJSON")
+    write_geojson(gdf, filename, drop_nulls=False, precision=COORDINATE_PRECISION)
 
 
 def save_without_nulls(gdf, filename):
-    gdf.to_file(filename, driver="GeoJSON")
     # https://github.com/geopandas/geopandas/issues/3521
-    remove_null_properties(filename)
+    write_geojson(gdf, filename, drop_nulls=True, precision=COORDINATE_PRECISION)
+
+
+def export_serial(
+    outlines,
+    addresses,
+    neighborhoods,
+    output_dir,
+    layers,
+    osm=None,
+    qa=False,
+    fix_area=None,
+    merge=False,
+    threads=8,
+    incremental=False,
+):
+    """Write every layer for the whole city at once, takes the same
+    arguments as export_parallel() except for jobs."""
+
+    def export(layer, gdf, save=save):
+        export_by_neighborhood(
+            gdf,
+            neighborhoods,
+            output_dir / layer,
+            output_dir / layers[layer],
+            save,
+            threads=threads,
+            incremental=incremental,
+        )
+
+    if qa:
+        outlines, errors = check_outlines(outlines, fix_area=fix_area)
+        export("qa", errors)
+
+    # Split results by neighborhood
+    export("neighborhoods", outlines)
 
+    if osm is not None:
+        classes = classify_outlines(outlines, osm)
+        for name in ["new", "mapped", "conflicting"]:
+            export(name, outlines[classes == name])
 
-# Load Calgary buildings data
-coc = load_shifted()
-print(coc)
-coc["coc_id"] = range(len(coc))
+    # split addresses by neighborhood
+    export("addresses", addresses)
 
-# Split results by neighborhood and print
-neighborhoods = download_neighborhoods("Calgary, Alberta, Canada")
-coc_by_neighborhoods = gpd.sjoin(coc, neighborhoods, how="inner")
+    if merge:
+        assigned, _ = assign_addresses(outlines, addresses)
+        export(
+            "merged",
+            merge_addresses(outlines, addresses, assigned),
+            save_without_nulls,
+        )
 
 
-neighborhood_dir = OUTPUT_DIR / "neighborhoods"
-neighborhood_dir.mkdir(exist_ok=True, parents=True)
-for name, group in coc_by_neighborhoods.groupby("name"):
-    safe_name = name.replace("/", "_")
-    neighborhood_buildings = coc[coc["coc_id"].isin(group["coc_id"])]
-    save(
-        neighborhood_buildings.copy().drop(columns=["coc_id"]),
-        neighborhood_dir / f"{safe_name}.geojson",
+if __name__ == "__main__":
+    args = ArgumentParser()
+    # Cached files are rebuilt automatically when their source file changes,
+    # --no-cache forces rebuilding them anyway
+    args.add_argument("--no-cache", action="store_true")
+    args.add_argument(
+        "--threads",
+        type=int,
+        default=8,
+        help="number of files to write at the same time",
     )
-    # print(f"Saved {name}")
-no_neighborhood = coc[~coc["coc_id"].isin(coc_by_neighborhoods["coc_id"])]
-save(
-    no_neighborhood.copy().drop(columns=["coc_id"]),
-    OUTPUT_DIR / "outside_calgary.geojson",
-)
-
-coc_addresses = gpd.read_file(ADDRESS_FILENAME)
-print(coc_addresses)
-coc_addresses["coc_id"] = range(len(coc_addresses))
-
-# split addresses by neighborhood
-coc_by_neighborhoods = gpd.sjoin(coc_addresses, neighborhoods, how="inner")
-print(coc_by_neighborhoods)
-
-neighborhood_dir = OUTPUT_DIR / "addresses"
-neighborhood_dir.mkdir(exist_ok=True, parents=True)
-for name, group in coc_by_neighborhoods.groupby("name"):
-    safe_name = name.replace("/", "_")
-    neighborhood_buildings = coc_addresses[
-        coc_addresses["coc_id"].isin(group["coc_id"])
-    ]
-    save(
-        neighborhood_buildings.copy().drop(columns=["coc_id"]),
-        neighborhood_dir / f"{safe_name}.geojson",
+    args.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="number of processes to split the neighborhoods between",
+    )
+    args.add_argument(
+        "--incremental",
+        action="store_true",
+        help="only write the files whose features changed since the last run",
+    )
+    args.add_argument(
+        "--merge-addresses",
+        action="store_true",
+        help="also write outlines with the address tags already merged into them",
+    )
+    args.add_argument(
+        "--qa",
+        action="store_true",
+        help="write overlapping outlines and almost shared nodes to buildings/qa/",
     )
-    # print(f"Saved {name}")
-no_neighborhood = coc_addresses[
-    ~coc_addresses["coc_id"].isin(coc_by_neighborhoods["coc_id"])
-]
-save(
-    no_neighborhood.copy().drop(columns=["coc_id"]),
-    OUTPUT_DIR / "coc_addresses_outside_calgary.geojson",
-)
+    args.add_argument(
+        "--fix-overlaps",
+        type=float,
+        metavar="AREA",
+        help="with --qa, cut overlaps smaller than AREA square meters out of the smaller outline",
+    )
+    args.add_argument(
+        "--conflate",
+        action="store_true",
+        help="split outlines into new/, mapped/ and conflicting/ "
+        "by comparing them to OSM buildings",
+    )
+    args = args.parse_args()
+    cache = not args.no_cache
+
+    # Load Calgary buildings data
+    coc = load_shifted()
+    print(coc)
+    neighborhoods = download_neighborhoods("Calgary, Alberta, Canada")
+    coc_addresses = load_addresses()
+    print(coc_addresses)
+    if args.conflate:
+        osm_buildings = download_osm_buildings("Calgary, Alberta, Canada")
+
+    layers = ["neighborhoods", "addresses"]
+    layers += ["qa"] if args.qa else []
+    layers += ["new", "mapped", "conflicting"] if args.conflate else []
+    layers += ["merged"] if args.merge_addresses else []
+    layers = {layer: LAYERS[layer] for layer in layers}
+    options = {
+        "osm": osm_buildings if args.conflate else None,
+        "qa": args.qa,
+        "fix_area": args.fix_overlaps,
+        "merge": args.merge_addresses,
+        "incremental": args.incremental,
+    }
+    if args.jobs > 1:
+        export_parallel(
+            coc,
+            coc_addresses,
+            neighborhoods,
+            OUTPUT_DIR,
+            layers,
+            args.jobs,
+            precision=COORDINATE_PRECISION,
+            **options,
+        )
+    else:
+        export_serial(
+            coc,
+            coc_addresses,
+            neighborhoods,
+            OUTPUT_DIR,
+            layers,
+            threads=args.threads,
+            **options,
+        )
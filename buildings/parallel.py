@@ -0,0 +1,237 @@
+"""Process every neighborhood in a separate process.
+
+The outlines, addresses and OSM buildings are written once to uncompressed
+Arrow files (with WKB geometries) that every worker memory-maps, so only the
+positions of each neighborhood's features are sent to the workers instead
+of pickled GeoDataFrames. Workers import only this module, so outlines.py
+isn't re-run by them on platforms that spawn new processes (macOS, Windows).
+"""
+
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pyarrow.feather as feather
+
+from address_assignment import assign_addresses, merge_addresses
+from export import (
+    fingerprint,
+    is_unchanged,
+    partition_by_neighborhood,
+    read_manifest,
+    report_changes,
+    safe_filename,
+    write_manifest,
+)
+from geojson_writer import write_geojson
+from osm_conflation import classify_outlines
+from qa import check_outlines
+
+# Set in every worker by init_worker()
+_tables = {}
+_options = {}
+
+
+def write_shared(gdf, path):
+    df = pd.DataFrame(gdf.drop(columns=gdf.geometry.name)).reset_index(drop=True)
+    df["geometry"] = gdf.geometry.to_wkb().to_numpy()
+    feather.write_feather(df, path, compression="uncompressed")
+    return path, gdf.crs
+
+
+def read_shared(name, positions):
+    table, crs = _tables[name]
+    df = table.take(positions).to_pandas()
+    geometry = gpd.GeoSeries.from_wkb(df.pop("geometry"), crs=crs)
+    return gpd.GeoDataFrame(df, geometry=geometry.values, crs=crs)
+
+
+def init_worker(shared, options):
+    for name, (path, crs) in shared.items():
+        _tables[name] = (feather.read_table(path, memory_map=True), crs)
+    _options.update(options)
+
+
+def process_neighborhood(
+    paths, outline_positions, address_positions, osm_positions, manifest, outside
+):
+    """Write every layer of one neighborhood, paths maps layer names to files.
+
+    Like the serial export, layers without features only get a file when
+    outside is true (the features outside every neighborhood). manifest maps
+    paths to their fingerprints from the last export. With incremental,
+    files with the same fingerprint aren't written again. Returns the
+    fingerprints and the layers that were written.
+    """
+    start = time.perf_counter()
+    fingerprints = {}
+    written = []
+
+    def write(layer, gdf, drop_nulls=False):
+        path = paths[layer]
+        if gdf.empty and not outside:
+            return
+        fingerprints[layer] = fingerprint(gdf)
+        if _options["incremental"] and is_unchanged(
+            manifest, path, fingerprints[layer]
+        ):
+            return
+        write_geojson(gdf, path, drop_nulls=drop_nulls, precision=_options["precision"])
+        written.append(layer)
+
+    outlines = read_shared("outlines", outline_positions)
+    if _options["qa"]:
+        outlines, errors = check_outlines(outlines, fix_area=_options["fix_area"])
+        write("qa", errors)
+    write("neighborhoods", outlines)
+
+    if "osm" in _tables:
+        classes = classify_outlines(outlines, read_shared("osm", osm_positions))
+        for name in ["new", "mapped", "conflicting"]:
+            write(name, outlines[classes == name])
+
+    addresses = read_shared("addresses", address_positions)
+    write("addresses", addresses)
+    if _options["merge_addresses"]:
+        assigned, _ = assign_addresses(outlines, addresses)
+        write("merged", merge_addresses(outlines, addresses, assigned), drop_nulls=True)
+    return len(outlines), time.perf_counter() - start, fingerprints, written
+
+
+def related(pairs, positions, size):
+    """Positions of the features paired with any of the features at positions."""
+    selected = np.zeros(size, dtype=bool)
+    selected[positions] = True
+    return np.unique(pairs[1][selected[pairs[0]]])
+
+
+def export_parallel(
+    outlines,
+    addresses,
+    neighborhoods,
+    output_dir,
+    layers,
+    jobs,
+    osm=None,
+    qa=False,
+    fix_area=None,
+    merge=False,
+    precision=None,
+    incremental=False,
+):
+    """Write the same files as export_serial() in outlines.py, one process
+    per neighborhood at a time.
+
+    layers maps the name of every layer (and its directory in output_dir) to
+    the file that gets the features outside every neighborhood. Overlaps
+    and address assignment are only checked within a neighborhood, so
+    results can differ from the serial export right at neighborhood
+    boundaries. With incremental, only files whose features changed since
+    the last export are written.
+    """
+    start = time.perf_counter()
+    outline_partitions, outline_outside = partition_by_neighborhood(
+        outlines, neighborhoods
+    )
+    address_partitions, address_outside = partition_by_neighborhood(
+        addresses, neighborhoods
+    )
+    tasks = {
+        name: (positions, address_partitions.get(name, np.array([], dtype=int)))
+        for name, positions in outline_partitions.items()
+    }
+    for name, positions in address_partitions.items():
+        tasks.setdefault(name, (np.array([], dtype=int), positions))
+    tasks[None] = (outline_outside, address_outside)
+
+    if osm is not None:
+        # OSM buildings that overlap a neighborhood's outlines, even the parts
+        # of them outside the neighborhood
+        osm_pairs = osm.sindex.query(outlines.geometry.values, predicate="intersects")
+
+    manifests = {}
+    for layer in layers:
+        (output_dir / layer).mkdir(exist_ok=True, parents=True)
+        manifests[layer] = read_manifest(output_dir / layer) if incremental else {}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        shared = {
+            "outlines": write_shared(outlines, tmp / "outlines.arrow"),
+            "addresses": write_shared(addresses, tmp / "addresses.arrow"),
+        }
+        if osm is not None:
+            shared["osm"] = write_shared(osm, tmp / "osm.arrow")
+        options = {
+            "qa": qa,
+            "fix_area": fix_area,
+            "merge_addresses": merge,
+            "precision": precision,
+            "incremental": incremental,
+        }
+
+        with ProcessPoolExecutor(
+            max_workers=jobs, initializer=init_worker, initargs=(shared, options)
+        ) as pool:
+            futures = {}
+            changed = {layer: [] for layer in layers}
+            # Largest neighborhoods first so no worker is left with a big one
+            # at the end
+            for name, (outline_positions, address_positions) in sorted(
+                tasks.items(), key=lambda task: -len(task[1][0])
+            ):
+                paths = {
+                    layer: (
+                        output_dir / outside
+                        if name is None
+                        else output_dir / layer / f"{safe_filename(name)}.geojson"
+                    )
+                    for layer, outside in layers.items()
+                }
+                osm_positions = (
+                    related(osm_pairs, outline_positions, len(outlines))
+                    if osm is not None
+                    else None
+                )
+                manifest = {
+                    str(path): manifests[layer].get(str(path))
+                    for layer, path in paths.items()
+                }
+                future = pool.submit(
+                    process_neighborhood,
+                    paths,
+                    outline_positions,
+                    address_positions,
+                    osm_positions,
+                    manifest,
+                    name is None,
+                )
+                futures[future] = (name or "outside", paths)
+            for future in as_completed(futures):
+                name, paths = futures[future]
+                count, seconds, fingerprints, written = future.result()
+                for layer, digest in fingerprints.items():
+                    manifests[layer][str(paths[layer])] = digest
+                for layer in written:
+                    changed[layer].append(paths[layer])
+                print(
+                    f"Exported {name} ({count} outlines) in {seconds:.2f}s",
+                    file=sys.stderr,
+                )
+
+    # The manifest is rewritten by full exports too, otherwise the next
+    # incremental export would compare against an older export's files
+    for layer in layers:
+        write_manifest(output_dir / layer, manifests[layer])
+        if incremental:
+            report_changes(output_dir / layer, changed[layer])
+    print(
+        f"Exported {len(tasks)} neighborhoods with {jobs} processes "
+        f"in {time.perf_counter() - start:.2f}s",
+        file=sys.stderr,
+    )
@@ -1,20 +1,82 @@
 #!/usr/bin/env python3
 
 import subprocess
+import sys
 import urllib
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 
 import geopandas as gpd
-import osmnx as ox
 import pandas as pd
+import shapely
+
+from calgary_osm import features
+from calgary_osm.crs import PROJECTED_CRS
+
+import progress_history
 
 BBOX = [-114.3387482, 50.8341488, -113.8194342, 51.2270627]
 
-# ------------------------------------------------------------
-# Input data
-# ------------------------------------------------------------
-print("[INFO] Reading community boundaries from CSV...")
-# https://data.calgary.ca/Base-Maps/Community-Boundaries/ab7m-fwn6
-communities = gpd.read_file("Community_District_Boundaries.csv")
+args = ArgumentParser()
+args.add_argument(
+    "--history",
+    type=Path,
+    default=Path("progress_history.sqlite"),
+    help="database that the numbers of every run are added to",
+)
+args.add_argument(
+    "--report",
+    action="store_true",
+    help="only print the changes since the previous run and exit",
+)
+args.add_argument(
+    "--days",
+    type=int,
+    default=30,
+    help="number of days to compute the rate of progress over",
+)
+args = args.parse_args()
+history = progress_history.connect(args.history)
+
+if args.report:
+    report = progress_history.report(history, args.days)
+    if report is None:
+        sys.exit(f"[ERROR] No runs in {args.history} yet")
+    previous, latest, start = report.attrs["runs"]
+    print(f"[STATS] Changes from {previous} to {latest}, rates since {start}")
+    print(
+        report[
+            report[[f"{metric}_change" for metric in progress_history.METRICS]]
+            .fillna(0)
+            .ne(0)
+            .any(axis=1)
+        ]
+        .sort_values("addr_ratio_change", ascending=False)
+        .to_string()
+    )
+    sys.exit()
+
+HIGHWAY_TAGS = {
+    "highway": [
+        "motorway",
+        "motorway_link",
+        "primary",
+        "primary_link",
+        "secondary",
+        "secondary_link",
+        "tertiary",
+        "tertiary_link",
+        "residential",
+        "unclassified",
+    ]
+}
+LAYERS = {
+    "buildings": {"building": True},
+    "addr_points": {"addr:street": True, "addr:housenumber": True},
+    "streets": HIGHWAY_TAGS,
+    "sidewalks": {"highway": "footway"},
+}
 
 NAME_REPLACEMENTS = {
     "KILLARNEY/GLENGARRY": "KILLARNEY",
@@ -26,17 +88,32 @@ NAME_REPLACEMENTS = {
     "GREENVIEW INDUSTRIAL PARK": "GREENVIEW INDUSTRIAL",
     "NORTH GLENMORE PARK": "NORTH GLENMORE",
 }
-communities["NAME"] = communities["NAME"].replace(NAME_REPLACEMENTS)
+
+# Everything except the neighborhoods is downloaded in one query, and both
+# queries run in the background while the City's data is being read
+print("[INFO] Downloading OSM neighborhoods, buildings, addresses and highways...")
+with ThreadPoolExecutor(max_workers=2) as downloads:
+    neighborhoods_download = downloads.submit(
+        features.features_from_place,
+        "Calgary, Alberta, Canada",
+        tags={"boundary": "administrative", "admin_level": "10"},
+    )
+    layers_download = downloads.submit(features.features_from_bbox_layers, BBOX, LAYERS)
+
+    # ------------------------------------------------------------
+    # Input data
+    # ------------------------------------------------------------
+    print("[INFO] Reading community boundaries from CSV...")
+    # https://data.calgary.ca/Base-Maps/Community-Boundaries/ab7m-fwn6
+    communities = gpd.read_file("Community_District_Boundaries.csv")
+    communities["NAME"] = communities["NAME"].replace(NAME_REPLACEMENTS)
+
+    neighborhoods = neighborhoods_download.result()
+    layers = layers_download.result()
 
 # ------------------------------------------------------------
 # OSM "neighborhood" relations (admin_level=10)
 # ------------------------------------------------------------
-print("[INFO] Downloading OSM neighborhood boundaries...")
-neighborhoods = ox.features.features_from_place(
-    "Calgary, Alberta, Canada",
-    tags={"boundary": "administrative", "admin_level": "10"},
-)
-
 neighborhoods = neighborhoods[neighborhoods["admin_level"] == "10"]
 # and only boundary=administrative
 neighborhoods = neighborhoods[neighborhoods["boundary"] == "administrative"]
@@ -76,8 +153,7 @@ if matched < len(neighborhoods):
 # ------------------------------------------------------------
 # Download all buildings inside Calgary bounding box
 # ------------------------------------------------------------
-print("[INFO] Downloading OSM buildings...")
-buildings = ox.features.features_from_bbox(BBOX, {"building": True})
+buildings = layers["buildings"]
 print(f"[INFO] Retrieved {len(buildings)} buildings.")
 
 # Ensure required columns exist
@@ -89,10 +165,6 @@ for col in ("source", "addr:street", "building", "note"):
 # Spatial join: assign each building to a neighborhood
 # ------------------------------------------------------------
 print("[INFO] Performing spatial join...")
-# target_crs = "EPSG:3857"
-# neighborhoods = neighborhoods.to_crs(target_crs)
-# buildings = buildings.to_crs(target_crs)
-
 joined = gpd.sjoin(
     buildings,
     neighborhoods[
@@ -115,10 +187,7 @@ print(f"[INFO] Unassigned buildings: {len(joined) - assigned}")
 # ------------------------------------------------------------
 # OSM addr points
 # ------------------------------------------------------------
-print("[INFO] Downloading OSM address points...")
-addr_points = ox.features.features_from_bbox(
-    BBOX, {"addr:street": True, "addr:housenumber": True}
-)
+addr_points = layers["addr_points"]
 print(f"[INFO] Retrieved {len(addr_points)} address points.")
 # Ensure required columns exist
 for col in ("addr:street", "addr:housenumber"):
@@ -140,49 +209,55 @@ addr_points = addr_points.groupby("_neighborhood").size().to_dict()
 # ------------------------------------------------------------
 print("[INFO] Generating per-neighborhood stats...")
 RESIDENTIAL_CODES = {"residential", "house", "detached", "yes"}
+COC_SOURCE = "City of Calgary Digital Aerial Survey building roof outlines"
+COC_NOTE = "City of Calgary rooflines - aquisition date - 2024-06-12T22:39:34.000Z"
 
-
-def stats(group):
-    name = group["_neighborhood"].iloc[0]
-    neighborhood_id = int(group["neighborhood_id"].iloc[0])
-    neighborhood_type = group["neighborhood_type"].iloc[0]
-    neighborhood_status = group["neighborhood_status"].iloc[0]
-
-    total = len(group)
-    residential = len(group[group["building"].isin(RESIDENTIAL_CODES)])
-    coc = len(
-        group[
-            group["source"]
-            == "City of Calgary Digital Aerial Survey building roof outlines"
-        ]
-    ) + len(
-        group[
-            group["note"]
-            == "City of Calgary rooflines - aquisition date - 2024-06-12T22:39:34.000Z"
-        ]
-    )
-    coc_ration = coc / total if total else 0
-    addr = int(group["addr:street"].notnull().sum())
-    if name in addr_points:
-        addr += addr_points[name]
-    addr_ratio = addr / residential if residential else 0
-    return pd.Series(
-        {
-            "total": total,
-            "residential": residential,
-            "coc_sourced": coc,
-            "coc_ratio": coc_ration,
-            "addressed": addr,
-            "addr_ratio": addr_ratio,
-            "neighborhood_type": neighborhood_type,
-            "status": neighborhood_status,
-            "id": neighborhood_id,
-            "link": f"https://openstreetmap.org/relation/{neighborhood_id}",
-        }
-    )
-
-
-summary = joined.dropna(subset=["_neighborhood"]).groupby("_neighborhood").apply(stats)
+in_neighborhood = joined.dropna(subset=["_neighborhood"])
+flags = pd.DataFrame(
+    {
+        "_neighborhood": in_neighborhood["_neighborhood"],
+        "residential": in_neighborhood["building"].isin(RESIDENTIAL_CODES),
+        # A building with both counts twice
+        "coc_sourced": (in_neighborhood["source"] == COC_SOURCE).astype(int)
+        + (in_neighborhood["note"] == COC_NOTE),
+        "addressed": in_neighborhood["addr:street"].notnull(),
+        "neighborhood_type": in_neighborhood["neighborhood_type"],
+        "status": in_neighborhood["neighborhood_status"],
+        "id": in_neighborhood["neighborhood_id"],
+    }
+)
+summary = flags.groupby("_neighborhood").agg(
+    total=("residential", "size"),
+    residential=("residential", "sum"),
+    coc_sourced=("coc_sourced", "sum"),
+    addressed=("addressed", "sum"),
+    neighborhood_type=("neighborhood_type", "first"),
+    status=("status", "first"),
+    id=("id", "first"),
+)
+summary["addressed"] += pd.Series(addr_points, dtype=int).reindex(
+    summary.index, fill_value=0
+)
+summary["coc_ratio"] = summary["coc_sourced"] / summary["total"]
+summary["addr_ratio"] = (summary["addressed"] / summary["residential"]).where(
+    summary["residential"] > 0, 0
+)
+summary["id"] = summary["id"].astype(int)
+summary["link"] = "https://openstreetmap.org/relation/" + summary["id"].astype(str)
+summary = summary[
+    [
+        "total",
+        "residential",
+        "coc_sourced",
+        "coc_ratio",
+        "addressed",
+        "addr_ratio",
+        "neighborhood_type",
+        "status",
+        "id",
+        "link",
+    ]
+]
 # only Residential and with more than 100 buildings
 summary = summary[summary["total"] > 100]
 # summary = summary.sort_index()
@@ -215,6 +290,7 @@ out geom;"""
     subprocess.run(["open", url])
 
 
+all_neighborhoods = summary
 summary = summary[
     (summary["neighborhood_type"] == "Residential")
     & (summary["total"] > 100)
@@ -237,62 +313,49 @@ open_neigh(
 # ------------------------------------------------------------
 # Step 2: Streets and Sidewalks by Neighborhood
 # ------------------------------------------------------------
-print("[INFO] Downloading Calgary highways...")
-highway_tags = {
-    "highway": [
-        "motorway",
-        "motorway_link",
-        "primary",
-        "primary_link",
-        "secondary",
-        "secondary_link",
-        "tertiary",
-        "tertiary_link",
-        "residential",
-        "unclassified",
-    ]
-}
-streets = ox.features.features_from_bbox(BBOX, highway_tags)
-
-# Filter LineStrings only and convert CRS for accurate length calc
+streets = layers["streets"]
 streets = streets[streets.geometry.type.isin(["LineString", "MultiLineString"])]
-streets = streets.set_geometry("geometry").to_crs("EPSG:4326")
-streets["length_m"] = streets.geometry.length
 
-# Assign neighborhoods
-streets_joined = gpd.sjoin(
-    streets,
-    neighborhoods[["geometry", "name"]].rename(columns={"name": "_neighborhood"}),
-    how="left",
-)
-streets_by_neigh = streets_joined.groupby("_neighborhood")["length_m"].sum()
-
-print("[INFO] Downloading sidewalks...")
-sidewalks = ox.features.features_from_bbox(BBOX, {"highway": "footway"})
+sidewalks = layers["sidewalks"]
 sidewalks = sidewalks[sidewalks.geometry.type.isin(["LineString", "MultiLineString"])]
-sidewalks = sidewalks.set_geometry("geometry").to_crs("EPSG:4326")
-sidewalks["length_m"] = sidewalks.geometry.length
 
-sidewalks_joined = gpd.sjoin(
-    sidewalks,
-    neighborhoods[["geometry", "name"]].rename(columns={"name": "_neighborhood"}),
-    how="left",
+
+def length_by_neighborhood(ways, neighborhoods):
+    """Total length in km of the ways in every neighborhood.
+
+    Ways that cross a neighborhood boundary are cut at it, so their length
+    isn't counted in full in both neighborhoods.
+    """
+    lines = ways.geometry.to_crs(PROJECTED_CRS).values
+    polygons = neighborhoods.geometry.to_crs(PROJECTED_CRS).values
+    shapely.prepare(polygons)
+    neighborhood_idx, way_idx = shapely.STRtree(lines).query(
+        polygons, predicate="intersects"
+    )
+    lines, polygons = lines[way_idx], polygons[neighborhood_idx]
+    lengths = shapely.length(lines)
+    # Most ways are entirely inside, only intersect the ones that aren't
+    crossing = ~shapely.contains_properly(polygons, lines)
+    lengths[crossing] = shapely.length(
+        shapely.intersection(lines[crossing], polygons[crossing])
+    )
+    names = neighborhoods["name"].to_numpy()[neighborhood_idx]
+    return pd.Series(lengths / 1000).groupby(names).sum()
+
+
+print("[INFO] Measuring streets and sidewalks...")
+length_df = pd.DataFrame(
+    {
+        "street_km": length_by_neighborhood(streets, neighborhoods),
+        "sidewalk_km": length_by_neighborhood(sidewalks, neighborhoods),
+    }
 )
-sidewalks_by_neigh = sidewalks_joined.groupby("_neighborhood")["length_m"].sum()
 
 # ------------------------------------------------------------
 # Combine into sidewalk-to-street ratio
 # ------------------------------------------------------------
 print("[INFO] Calculating sidewalk-to-street ratios...")
-length_df = pd.DataFrame(
-    {
-        "street_length_m": streets_by_neigh,
-        "sidewalk_length_m": sidewalks_by_neigh,
-    }
-)
-length_df["sidewalk_ratio"] = (
-    length_df["sidewalk_length_m"] / length_df["street_length_m"]
-)
+length_df["sidewalk_ratio"] = length_df["sidewalk_km"] / length_df["street_km"]
 
 # Merge into summary
 new_summary = summary.merge(length_df, left_index=True, right_index=True, how="left")
@@ -306,8 +369,8 @@ print(
             "_neighborhood",
             "id",
             "sidewalk_ratio",
-            "street_length_m",
-            "sidewalk_length_m",
+            "street_km",
+            "sidewalk_km",
         ]
     ]
     .to_string(index=False)
@@ -332,3 +395,9 @@ for index, row in a.sort_values("sidewalk_ratio").iterrows():
     name = index  # because _neighborhood is the index
     print(f"* {{{{Relation|{relation_id}|{name}}}}}")
 print("}}")
+
+run_at = progress_history.save_run(
+    history,
+    all_neighborhoods.merge(length_df, left_index=True, right_index=True, how="left"),
+)
+print(f"[INFO] Saved run {run_at} to {args.history}")
@@ -0,0 +1,105 @@
+"""Append-only history of progress.py's per-neighborhood metrics in SQLite.
+
+Every run of progress.py adds one row per neighborhood, keyed by
+(neighborhood_id, run_at), so comparing any two runs only reads the rows of
+those runs.
+"""
+
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+
+METRICS = ["total", "coc_ratio", "addr_ratio", "sidewalk_ratio"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (run_at TEXT PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS metrics (
+    neighborhood_id INTEGER NOT NULL,
+    run_at TEXT NOT NULL REFERENCES runs (run_at),
+    name TEXT,
+    total INTEGER,
+    coc_ratio REAL,
+    addr_ratio REAL,
+    sidewalk_ratio REAL,
+    PRIMARY KEY (neighborhood_id, run_at)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS metrics_run_at ON metrics (run_at);
+"""
+
+
+def connect(path):
+    db = sqlite3.connect(path)
+    db.executescript(SCHEMA)
+    return db
+
+
+def save_run(db, summary, run_at=None):
+    """Store summary (indexed by neighborhood name, with an "id" column and
+    the METRICS columns) as a new run."""
+    if run_at is None:
+        run_at = datetime.now(timezone.utc).isoformat(timespec="microseconds")
+    rows = pd.DataFrame(
+        {
+            "neighborhood_id": summary["id"].astype(int),
+            "run_at": run_at,
+            "name": summary.index,
+            **{metric: summary[metric] for metric in METRICS},
+        }
+    )
+    with db:
+        db.execute("INSERT INTO runs (run_at) VALUES (?)", (run_at,))
+        db.executemany(
+            f"INSERT INTO metrics VALUES ({', '.join('?' * len(rows.columns))})",
+            rows.astype(object).where(rows.notnull(), None).itertuples(index=False),
+        )
+    return run_at
+
+
+def read_run(db, run_at):
+    return pd.read_sql(
+        "SELECT * FROM metrics WHERE run_at = ?", db, params=(run_at,)
+    ).set_index("neighborhood_id")
+
+
+def last_runs(db, count=2):
+    return [
+        row[0]
+        for row in db.execute(
+            "SELECT run_at FROM runs ORDER BY run_at DESC LIMIT ?", (count,)
+        )
+    ]
+
+
+def first_run_since(db, since):
+    row = db.execute(
+        "SELECT MIN(run_at) FROM runs WHERE run_at >= ?", (since,)
+    ).fetchone()
+    return row[0]
+
+
+def report(db, days=30):
+    """Changes since the previous run and the rate of progress per week over
+    the last days days, for every neighborhood in the latest run."""
+    runs = last_runs(db)
+    if not runs:
+        return None
+    latest = read_run(db, runs[0])
+    previous = read_run(db, runs[-1])
+    since = (datetime.fromisoformat(runs[0]) - timedelta(days=days)).isoformat()
+    start_at = first_run_since(db, since)
+    start = read_run(db, start_at)
+    weeks = (
+        datetime.fromisoformat(runs[0]) - datetime.fromisoformat(start_at)
+    ) / timedelta(weeks=1)
+
+    table = latest[["name"] + METRICS].copy()
+    for metric in METRICS:
+        table[f"{metric}_change"] = latest[metric] - previous[metric].reindex(
+            latest.index
+        )
+    for metric in ["coc_ratio", "addr_ratio"]:
+        change = latest[metric] - start[metric].reindex(latest.index)
+        table[f"{metric}_per_week"] = change / weeks if weeks else float("nan")
+    table.attrs["runs"] = (runs[-1], runs[0], start_at)
+    return table
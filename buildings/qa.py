@@ -0,0 +1,124 @@
+import sys
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+
+from calgary_osm.crs import PROJECTED_CRS
+
+
+def make_valid(polygons):
+    """Repair invalid polygons (self-intersecting rings, etc.), intersection
+    and difference raise a GEOSException on them."""
+    polygons = np.array(polygons, dtype=object)
+    invalid = ~shapely.is_valid(polygons)
+    polygons[invalid] = shapely.make_valid(polygons[invalid])
+    return polygons
+
+
+def find_overlaps(polygons, min_area):
+    """Return (i, j, intersection) for every pair of polygons i < j whose
+    intersection is larger than min_area."""
+    polygons = make_valid(polygons)
+    tree = shapely.STRtree(polygons)
+    i, j = tree.query(polygons, predicate="intersects")
+    pairs = i < j
+    i, j = i[pairs], j[pairs]
+    # Touching outlines "intersect" too, their intersection has no area
+    intersections = shapely.intersection(polygons[i], polygons[j])
+    large = shapely.area(intersections) > min_area
+    return i[large], j[large], intersections[large]
+
+
+def find_close_vertices(polygons, tolerance):
+    """Return (i, j, vertex) for vertices of polygon i that are within
+    tolerance of a vertex of a different polygon j (including ones at the
+    exact same location)."""
+    tree = shapely.STRtree(polygons)
+    i, j = tree.query(polygons, predicate="dwithin", distance=tolerance)
+    near = np.unique(np.concatenate([i[i != j], j[i != j]]))
+
+    coords, owner = shapely.get_coordinates(polygons[near], return_index=True)
+    owner = near[owner]
+    vertices = shapely.points(coords)
+    vertex_tree = shapely.STRtree(vertices)
+    a, b = vertex_tree.query(vertices, predicate="dwithin", distance=tolerance)
+    different = owner[a] < owner[b]
+    a, b = a[different], b[different]
+    # One error per pair of polygons and location
+    errors = pd.DataFrame(
+        {"i": owner[a], "j": owner[b], "x": coords[a, 0], "y": coords[a, 1]}
+    ).drop_duplicates()
+    return (
+        errors["i"].to_numpy(),
+        errors["j"].to_numpy(),
+        shapely.points(errors[["x", "y"]].to_numpy()),
+    )
+
+
+def separate_overlaps(polygons, i, j, intersections, max_area):
+    """Remove overlaps smaller than max_area from the smaller of the two polygons."""
+    polygons = polygons.copy()
+    small = shapely.area(intersections) <= max_area
+    i, j = i[small], j[small]
+    i_smaller = shapely.area(polygons[i]) <= shapely.area(polygons[j])
+    cut = np.where(i_smaller, i, j)
+    keep = np.where(i_smaller, j, i)
+    fixed = 0
+    for c, k in zip(cut.tolist(), keep.tolist()):
+        difference = shapely.difference(
+            shapely.make_valid(polygons[c]), shapely.make_valid(polygons[k])
+        )
+        if shapely.get_type_id(difference) == 3 and not shapely.is_empty(difference):
+            polygons[c] = difference
+            fixed += 1
+    print(f"[QA] Separated {fixed} small overlaps", file=sys.stderr)
+    return polygons
+
+
+def check_outlines(outlines, min_overlap_area=0.1, vertex_tolerance=0.2, fix_area=None):
+    """Find overlapping outlines and vertices of different outlines that are
+    (almost) at the same location.
+
+    Areas are in square meters, distances in meters. If fix_area is given,
+    overlaps smaller than that are cut out of the smaller outline.
+    Returns the (possibly fixed) outlines and a GeoDataFrame of errors.
+    """
+    polygons = outlines.geometry.to_crs(PROJECTED_CRS).values
+    i, j, intersections = find_overlaps(polygons, min_overlap_area)
+    overlaps = gpd.GeoDataFrame(
+        {
+            "error": "overlap",
+            "building_1": outlines["building"].to_numpy()[i],
+            "building_2": outlines["building"].to_numpy()[j],
+            "area_m2": shapely.area(intersections).round(2),
+        },
+        geometry=intersections,
+        crs=PROJECTED_CRS,
+    )
+    vi, vj, vertices = find_close_vertices(polygons, vertex_tolerance)
+    close_vertices = gpd.GeoDataFrame(
+        {
+            "error": "close_vertices",
+            "building_1": outlines["building"].to_numpy()[vi],
+            "building_2": outlines["building"].to_numpy()[vj],
+        },
+        geometry=vertices,
+        crs=PROJECTED_CRS,
+    )
+    print(
+        f"[QA] {len(overlaps)} overlaps, {len(close_vertices)} close vertices",
+        file=sys.stderr,
+    )
+    errors = pd.concat([overlaps, close_vertices], ignore_index=True).to_crs(
+        outlines.crs
+    )
+
+    if fix_area is not None:
+        fixed = separate_overlaps(polygons, i, j, intersections, fix_area)
+        outlines = outlines.copy()
+        outlines[outlines.geometry.name] = gpd.GeoSeries(
+            fixed, index=outlines.index, crs=PROJECTED_CRS
+        ).to_crs(outlines.crs)
+    return outlines, errors
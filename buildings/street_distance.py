@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+import shapely
+
+from calgary_osm.crs import PROJECTED_CRS
+
+
+def distance_to_named_street(points, point_keys, streets, street_keys, max_distance):
+    """Distance in meters from every point to the nearest street with the same key.
+
+    points and streets are GeoSeries, point_keys and street_keys Series of
+    join keys. Points closer than max_distance to a street with their key get
+    a distance of 0 (it's not computed exactly), points whose key doesn't
+    belong to any street get NaN.
+    """
+    points = points.to_crs(PROJECTED_CRS).values
+    streets = streets.to_crs(PROJECTED_CRS).values
+    # Closed ways can come back as polygons, we want the distance to their outline
+    is_polygon = np.isin(shapely.get_type_id(streets), [3, 6])
+    streets = np.where(is_polygon, shapely.boundary(streets), streets)
+    point_keys = point_keys.to_numpy()
+    street_keys = street_keys.to_numpy()
+
+    # Most points are near a street with their name, find those in one bulk
+    # index query first
+    tree = shapely.STRtree(streets)
+    point_idx, street_idx = tree.query(
+        points, predicate="dwithin", distance=max_distance
+    )
+    same = point_keys[point_idx] == street_keys[street_idx]
+    near = np.zeros(len(points), dtype=bool)
+    near[point_idx[same]] = True
+
+    # One geometry with every way of each street, for the exact distance
+    # to the others
+    codes, unique_keys = pd.factorize(street_keys)
+    order = np.argsort(codes, kind="stable")
+    named_streets = shapely.geometrycollections(streets[order], indices=codes[order])
+    street_codes = pd.Index(unique_keys).get_indexer(point_keys)
+
+    distances = np.full(len(points), np.nan)
+    distances[near] = 0
+    far = ~near & (street_codes != -1)
+    distances[far] = shapely.distance(points[far], named_streets[street_codes[far]])
+    return distances
@@ -0,0 +1,134 @@
+"""Remove unnecessary nodes from building outlines and square their corners.
+
+Works on the coordinates of every ring of every outline at once. Rings are
+stored as one coordinate array plus the ring each coordinate belongs to,
+without the closing coordinate, so neighbors of a vertex can be found with
+index arithmetic instead of looping over geometries.
+"""
+
+import sys
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+
+from calgary_osm.crs import PROJECTED_CRS
+
+
+def neighbors(ring, n_rings):
+    lengths = np.bincount(ring, minlength=n_rings)
+    starts = np.cumsum(lengths) - lengths
+    position = np.arange(len(ring)) - starts[ring]
+    length = lengths[ring]
+    previous = starts[ring] + (position - 1) % length
+    following = starts[ring] + (position + 1) % length
+    return previous, following
+
+
+def remove_vertices(coords, ring, n_rings, tolerance, max_passes=10):
+    """Remove vertices closer than tolerance to the next vertex or to the line
+    between their neighbors. Rings never go below 3 vertices."""
+    for _ in range(max_passes):
+        previous, following = neighbors(ring, n_rings)
+        to_next = coords[following] - coords
+        duplicate = np.hypot(*to_next.T) < tolerance
+        chord = coords[following] - coords[previous]
+        offset = coords - coords[previous]
+        chord_length = np.hypot(*chord.T)
+        cross = np.abs(chord[:, 0] * offset[:, 1] - chord[:, 1] * offset[:, 0])
+        collinear = cross < tolerance * np.maximum(chord_length, tolerance)
+        flagged = duplicate | collinear
+        # Removing two neighbors at once can cut a corner off a curve
+        remove = flagged & ~flagged[previous]
+        remaining = np.bincount(ring, minlength=n_rings) - np.bincount(
+            ring[remove], minlength=n_rings
+        )
+        remove &= remaining[ring] >= 3
+        if not remove.any():
+            break
+        coords, ring = coords[~remove], ring[~remove]
+    return coords, ring
+
+
+def orthogonalize(coords, ring, n_rings, max_angle=5, max_shift=0.2):
+    """Square the corners of rings whose edges are all within max_angle
+    degrees of two perpendicular directions, unless that would move a
+    vertex more than max_shift meters."""
+    previous, following = neighbors(ring, n_rings)
+    edges = coords[following] - coords
+    edge_length = np.hypot(*edges.T)
+    angle = np.arctan2(edges[:, 1], edges[:, 0])
+
+    # Main direction of every ring, edges 90 degrees apart count as the same
+    cos = np.bincount(ring, edge_length * np.cos(4 * angle), minlength=n_rings)
+    sin = np.bincount(ring, edge_length * np.sin(4 * angle), minlength=n_rings)
+    direction = (np.arctan2(sin, cos) / 4)[ring]
+
+    relative = (angle - direction) % np.pi
+    horizontal = np.minimum(relative, np.pi - relative) < np.radians(max_angle)
+    vertical = np.abs(relative - np.pi / 2) < np.radians(max_angle)
+    square = (horizontal | vertical) & (horizontal != horizontal[previous])
+    square_ring = np.bincount(ring, ~square, minlength=n_rings) == 0
+
+    # Rotate so the ring's edges are parallel to the axes, then every vertex
+    # takes its x from its vertical edge and its y from its horizontal edge
+    cos, sin = np.cos(direction), np.sin(direction)
+    x = coords[:, 0] * cos + coords[:, 1] * sin
+    y = -coords[:, 0] * sin + coords[:, 1] * cos
+    x_new = np.where(horizontal, x[previous] + x, x + x[following]) / 2
+    y_new = np.where(horizontal, y + y[following], y[previous] + y) / 2
+    squared = np.column_stack([x_new * cos - y_new * sin, x_new * sin + y_new * cos])
+
+    shift = np.hypot(*(squared - coords).T)
+    too_far = np.bincount(ring, shift > max_shift, minlength=n_rings) > 0
+    square_ring &= ~too_far
+    return np.where(square_ring[ring][:, None], squared, coords), square_ring.sum()
+
+
+def reduce_vertices(geometry, building, tolerance=0.1, max_angle=5, max_shift=0.2):
+    """Clean up outlines (a GeoSeries) and report how many nodes were removed
+    for every value of building."""
+    crs = geometry.crs
+    geometry = geometry.to_crs(PROJECTED_CRS)
+    polygons, polygon_geometry = shapely.get_parts(geometry.values, return_index=True)
+    # Empty polygons have no rings, they're left as they are
+    not_empty = ~shapely.is_empty(polygons)
+    polygons, polygon_geometry = polygons[not_empty], polygon_geometry[not_empty]
+    rings, ring_polygon = shapely.get_rings(polygons, return_index=True)
+    coords, ring = shapely.get_coordinates(rings, return_index=True)
+    if len(coords) == 0:
+        return geometry.to_crs(crs)
+    # Drop the closing coordinate of every ring
+    is_last = np.r_[ring[1:] != ring[:-1], True]
+    coords, ring = coords[~is_last], ring[~is_last]
+
+    coords, ring = remove_vertices(coords, ring, len(rings), tolerance)
+    coords, squared = orthogonalize(coords, ring, len(rings), max_angle, max_shift)
+    coords, ring = remove_vertices(coords, ring, len(rings), tolerance)
+
+    rings = shapely.linearrings(coords, indices=ring)
+    polygons = shapely.polygons(rings, indices=ring_polygon)
+    is_multi = shapely.get_type_id(geometry.values) == 6
+    cleaned = np.array(geometry.values, dtype=object)
+    has_parts, first = np.unique(polygon_geometry, return_index=True)
+    cleaned[has_parts] = polygons[first]
+    multi = is_multi[polygon_geometry]
+    if multi.any():
+        multi_geometry, indices = np.unique(
+            polygon_geometry[multi], return_inverse=True
+        )
+        cleaned[multi_geometry] = shapely.multipolygons(
+            polygons[multi], indices=indices
+        )
+
+    before = pd.Series(shapely.get_num_coordinates(geometry.values)).groupby(
+        building.to_numpy()
+    )
+    after = pd.Series(shapely.get_num_coordinates(cleaned)).groupby(building.to_numpy())
+    report = pd.DataFrame({"before": before.sum(), "after": after.sum()})
+    report["removed"] = 1 - report["after"] / report["before"]
+    print(f"Squared {squared} rings, nodes per building type:", file=sys.stderr)
+    print(report.to_string(formatters={"removed": "{:.1%}".format}), file=sys.stderr)
+
+    return gpd.GeoSeries(cleaned, index=geometry.index, crs=PROJECTED_CRS).to_crs(crs)
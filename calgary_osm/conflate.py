@@ -0,0 +1,178 @@
+"""Match City of Calgary points to existing OpenStreetMap points.
+
+Points are projected to UTM zone 12N and put in an STRtree, so only pairs
+that are already close are compared. Candidates are then checked with the
+exact geodesic distance and the attribute comparators, and each OSM point
+is assigned to at most one City point (closest pairs first).
+"""
+
+import numpy as np
+import pyproj
+import shapely
+
+from calgary_osm.crs import PROJECTED_CRS
+
+_to_projected = pyproj.Transformer.from_crs("EPSG:4326", PROJECTED_CRS, always_xy=True)
+_geod = pyproj.Geod(ellps="WGS84")
+
+
+def project(lonlat):
+    lonlat = np.asarray(lonlat, dtype=float).reshape(-1, 2)
+    x, y = _to_projected.transform(lonlat[:, 0], lonlat[:, 1])
+    return shapely.points(x, y)
+
+
+def geodesic_distance(lonlat1, lonlat2):
+    _, _, distance = _geod.inv(
+        lonlat1[:, 0], lonlat1[:, 1], lonlat2[:, 0], lonlat2[:, 1]
+    )
+    return distance
+
+
+def candidate_pairs(source, target, distance, source_keys=None, target_keys=None):
+    """Return (source index, target index, distance in meters) of every pair
+    closer than distance (and with equal keys, if they're given), closest first.
+
+    source and target are arrays of (lon, lat).
+    """
+    source = np.asarray(source, dtype=float).reshape(-1, 2)
+    target = np.asarray(target, dtype=float).reshape(-1, 2)
+    tree = shapely.STRtree(project(target))
+    # Leave some room for the projection's scale error, the exact distance
+    # is checked below
+    source_idx, target_idx = tree.query(
+        project(source), predicate="dwithin", distance=distance * 1.01
+    )
+    if source_keys is not None:
+        same = (
+            np.asarray(source_keys, dtype=object)[source_idx]
+            == np.asarray(target_keys, dtype=object)[target_idx]
+        )
+        source_idx, target_idx = source_idx[same], target_idx[same]
+
+    distances = geodesic_distance(source[source_idx], target[target_idx])
+    close = distances < distance
+    source_idx, target_idx, distances = (
+        source_idx[close],
+        target_idx[close],
+        distances[close],
+    )
+    order = np.argsort(distances, kind="stable")
+    return source_idx[order], target_idx[order], distances[order]
+
+
+def assign(source_idx, target_idx, n_source, n_target):
+    """Greedily pair up candidates (which must be sorted closest first) so that
+    every source and every target point is used at most once.
+
+    Returns the index of the matched target point for every source point,
+    or -1 if it wasn't matched.
+    """
+    matched = np.full(n_source, -1)
+    target_taken = np.zeros(n_target, dtype=bool)
+    for s, t in zip(source_idx.tolist(), target_idx.tolist()):
+        if matched[s] == -1 and not target_taken[t]:
+            matched[s] = t
+            target_taken[t] = True
+    return matched
+
+
+def match_points(
+    source,
+    target,
+    distance,
+    source_keys=None,
+    target_keys=None,
+    compare=None,
+    source_items=None,
+    target_items=None,
+):
+    """Match every source point to at most one target point.
+
+    source and target are arrays of (lon, lat). Points only match if they're
+    closer than distance meters, their keys are equal (if keys are given) and
+    compare(source_item, target_item) is true (if compare is given).
+
+    Returns (matched, status, distances): the matched target index (or -1),
+    "existing", "new" or "ambiguous" and the distance to the matched point
+    for every source point. Ambiguous points had candidates, but all of them
+    were closer to other source points.
+    """
+    n_source = len(source)
+    n_target = len(target)
+    source_idx, target_idx, distances = candidate_pairs(
+        source, target, distance, source_keys, target_keys
+    )
+    if compare is not None:
+        keep = np.array(
+            [
+                compare(source_items[s], target_items[t])
+                for s, t in zip(source_idx.tolist(), target_idx.tolist())
+            ],
+            dtype=bool,
+        )
+        source_idx, target_idx, distances = (
+            source_idx[keep],
+            target_idx[keep],
+            distances[keep],
+        )
+
+    matched = assign(source_idx, target_idx, n_source, n_target)
+
+    status = np.full(n_source, "new", dtype=object)
+    status[np.unique(source_idx)] = "ambiguous"
+    status[matched != -1] = "existing"
+
+    matched_distance = np.full(n_source, np.nan)
+    pair_matched = matched[source_idx] == target_idx
+    matched_distance[source_idx[pair_matched]] = distances[pair_matched]
+    return matched, status, matched_distance
+
+
+def find_duplicates(points, distance, keys=None):
+    """Return (i, j, distance) for every pair of points i < j closer than distance."""
+    i, j, distances = candidate_pairs(points, points, distance, keys, keys)
+    different = i < j
+    return i[different], j[different], distances[different]
+
+
+def feature_lonlat(features):
+    return np.array(
+        [feature["geometry"]["coordinates"][:2] for feature in features], dtype=float
+    ).reshape(-1, 2)
+
+
+def feature_collection(features):
+    return {"type": "FeatureCollection", "features": features}
+
+
+def conflate_features(
+    source, target, distance, key=None, target_key=None, compare=None
+):
+    """Split the source GeoJSON point features into existing/new/ambiguous
+    FeatureCollections by matching them to the target features.
+
+    key(feature) and target_key(feature) (defaults to key) return the value
+    that has to be equal for two points to match, compare(source_feature,
+    target_feature) can reject any other candidate pair.
+    Returns the three FeatureCollections and the list of
+    (source feature, target feature, distance) matches.
+    """
+    target_key = target_key or key
+    matched, status, distances = match_points(
+        feature_lonlat(source),
+        feature_lonlat(target),
+        distance,
+        source_keys=[key(f) for f in source] if key else None,
+        target_keys=[target_key(f) for f in target] if key else None,
+        compare=compare,
+        source_items=source,
+        target_items=target,
+    )
+    collections = {"existing": [], "new": [], "ambiguous": []}
+    matches = []
+    for feature, s, t, d in zip(source, status, matched, distances):
+        collections[s].append(feature)
+        if t != -1:
+            matches.append((feature, target[t], d))
+    return {s: feature_collection(f) for s, f in collections.items()}, matches
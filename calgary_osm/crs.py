@@ -0,0 +1,4 @@
+"""Coordinate reference systems shared by the scripts."""
+
+# UTM zone 12N, meters, for distances, lengths and areas in Calgary
+PROJECTED_CRS = "EPSG:32612"
@@ -0,0 +1,257 @@
+"""Indexed local store for an OpenStreetMap extract (.osm.pbf or .osm).
+
+The extract is parsed once with pyosmium into an SQLite database next to it,
+then tag filter queries are answered from the database instead of Overpass.
+"""
+
+import json
+import sqlite3
+import sys
+from pathlib import Path
+
+import geopandas as gpd
+import pandas as pd
+import shapely
+
+# Closed ways with one of these keys are areas, other closed ways are lines
+# (a simplified version of what osmnx/Overpass do)
+AREA_KEYS = {
+    "amenity",
+    "area:highway",
+    "boundary",
+    "building",
+    "building:part",
+    "landuse",
+    "leisure",
+    "man_made",
+    "natural",
+    "place",
+    "shop",
+    "tourism",
+    "water",
+}
+
+SCHEMA = """
+CREATE TABLE features (
+    fid INTEGER PRIMARY KEY,
+    element TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    tags TEXT NOT NULL,
+    geometry BLOB NOT NULL
+);
+CREATE TABLE tags (
+    fid INTEGER NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL
+);
+CREATE VIRTUAL TABLE bounds USING rtree(fid, minx, maxx, miny, maxy);
+"""
+
+INDEXES = """
+CREATE UNIQUE INDEX features_element_id ON features (element, id);
+CREATE INDEX tags_key_value ON tags (key, value);
+"""
+
+BATCH_SIZE = 50_000
+
+
+def is_area(tags, closed):
+    if not closed or tags.get("area") == "no":
+        return False
+    return tags.get("area") == "yes" or any(key in tags for key in AREA_KEYS)
+
+
+def store_path(extract_path):
+    extract_path = Path(extract_path)
+    return extract_path.with_name(extract_path.name + ".sqlite")
+
+
+class ExtractLoader:
+    """Collects tagged nodes, ways and multipolygon relations from an extract."""
+
+    def __init__(self, db):
+        import osmium
+
+        self.db = db
+        self.rows = []
+        self.wkb = osmium.geom.WKBFactory()
+        self.handler = osmium.make_simple_handler(
+            node=self.node, way=self.way, area=self.area
+        )
+
+    def add(self, element, osm_id, tags, geometry):
+        self.rows.append((element, osm_id, tags, geometry))
+        if len(self.rows) >= BATCH_SIZE:
+            self.flush()
+
+    def node(self, n):
+        if not n.tags:
+            return
+        tags = dict(n.tags)
+        self.add("node", n.id, tags, shapely.points(n.location.lon, n.location.lat))
+
+    def way(self, w):
+        if not w.tags:
+            return
+        tags = dict(w.tags)
+        try:
+            coords = [(node.lon, node.lat) for node in w.nodes]
+        except Exception:
+            # Nodes outside the extract
+            return
+        if len(coords) < 2:
+            return
+        closed = len(coords) >= 4 and coords[0] == coords[-1]
+        if is_area(tags, closed):
+            geometry = shapely.polygons(coords)
+        else:
+            geometry = shapely.linestrings(coords)
+        self.add("way", w.id, tags, geometry)
+
+    def area(self, a):
+        # Closed ways are handled in way(), only multipolygon/boundary relations here
+        if a.from_way() or not a.tags:
+            return
+        try:
+            geometry = shapely.from_wkb(self.wkb.create_multipolygon(a))
+        except Exception as e:
+            print(f"Invalid relation {a.orig_id()}: {e}", file=sys.stderr)
+            return
+        self.add("relation", a.orig_id(), dict(a.tags), geometry)
+
+    def flush(self):
+        if not self.rows:
+            return
+        cursor = self.db.cursor()
+        geometries = [row[3] for row in self.rows]
+        wkbs = shapely.to_wkb(geometries)
+        bounds = shapely.bounds(geometries)
+        for (element, osm_id, tags, _), wkb, (minx, miny, maxx, maxy) in zip(
+            self.rows, wkbs, bounds
+        ):
+            cursor.execute(
+                "INSERT INTO features (element, id, tags, geometry) VALUES (?, ?, ?, ?)",
+                (element, osm_id, json.dumps(tags, ensure_ascii=False), wkb),
+            )
+            fid = cursor.lastrowid
+            cursor.executemany(
+                "INSERT INTO tags (fid, key, value) VALUES (?, ?, ?)",
+                [(fid, key, value) for key, value in tags.items()],
+            )
+            cursor.execute(
+                "INSERT INTO bounds (fid, minx, maxx, miny, maxy) VALUES (?, ?, ?, ?, ?)",
+                (fid, minx, maxx, miny, maxy),
+            )
+        self.db.commit()
+        self.rows = []
+
+    def load(self, extract_path):
+        # "flex_mem" keeps node locations in memory, which is fine for a city
+        self.handler.apply_file(str(extract_path), locations=True, idx="flex_mem")
+        self.flush()
+
+
+def build_store(extract_path, db_path=None):
+    """Parse extract_path into an indexed SQLite database and return its path."""
+    db_path = Path(db_path or store_path(extract_path))
+    tmp_path = db_path.with_name(db_path.name + ".tmp")
+    tmp_path.unlink(missing_ok=True)
+    print(f"Indexing {extract_path} into {db_path}...", file=sys.stderr)
+    db = sqlite3.connect(tmp_path)
+    db.executescript(SCHEMA)
+    ExtractLoader(db).load(extract_path)
+    db.executescript(INDEXES)
+    db.close()
+    tmp_path.replace(db_path)
+    return db_path
+
+
+def tag_filter_sql(tags):
+    """Turn an osmnx style tags dict into an SQL condition on the tags table.
+
+    Like osmnx, a feature matches if it matches any of the key/value filters.
+    """
+    conditions = []
+    params = []
+    for key, value in tags.items():
+        if value is True:
+            conditions.append("key = ?")
+            params.append(key)
+        elif isinstance(value, str):
+            conditions.append("(key = ? AND value = ?)")
+            params += [key, value]
+        else:
+            conditions.append(
+                f"(key = ? AND value IN ({', '.join('?' * len(value))}))"
+            )
+            params += [key, *value]
+    return " OR ".join(conditions), params
+
+
+class LocalStore:
+    """Answers osmnx style feature queries from an indexed extract."""
+
+    def __init__(self, extract_path):
+        self.extract_path = Path(extract_path)
+        db_path = store_path(self.extract_path)
+        if (
+            not db_path.exists()
+            or db_path.stat().st_mtime < self.extract_path.stat().st_mtime
+        ):
+            build_store(self.extract_path, db_path)
+        self.db = sqlite3.connect(db_path, check_same_thread=False)
+
+    def query(self, tags, bbox=None):
+        where, params = tag_filter_sql(tags)
+        sql = f"""
+            SELECT f.element, f.id, f.tags, f.geometry
+            FROM features f
+            WHERE f.fid IN (SELECT fid FROM tags WHERE {where})
+        """
+        if bbox is not None:
+            left, bottom, right, top = bbox
+            sql += """
+                AND f.fid IN (
+                    SELECT fid FROM bounds
+                    WHERE maxx >= ? AND minx <= ? AND maxy >= ? AND miny <= ?
+                )
+            """
+            params += [left, right, bottom, top]
+        rows = self.db.execute(sql, params).fetchall()
+
+        index = pd.MultiIndex.from_tuples(
+            [(element, osm_id) for element, osm_id, _, _ in rows],
+            names=["element", "id"],
+        )
+        gdf = gpd.GeoDataFrame(
+            pd.DataFrame.from_records(
+                [json.loads(row[2]) for row in rows], index=index
+            ),
+            geometry=shapely.from_wkb([row[3] for row in rows]),
+            crs="EPSG:4326",
+        )
+        return gdf
+
+    def features_from_bbox(self, bbox, tags):
+        gdf = self.query(tags, bbox)
+        return gdf[gdf.intersects(shapely.box(*bbox))]
+
+    def place_polygon(self, place):
+        # "Calgary, Alberta, Canada" -> the administrative boundary named "Calgary"
+        # with the lowest admin_level in the extract
+        name = place.split(",")[0].strip()
+        boundaries = self.query({"boundary": "administrative"})
+        if "name" in boundaries.columns:
+            boundaries = boundaries[
+                (boundaries["name"] == name)
+                & boundaries.geom_type.isin(["Polygon", "MultiPolygon"])
+            ]
+        if boundaries.empty or "name" not in boundaries.columns:
+            raise ValueError(f"No boundary named {name!r} in {self.extract_path}")
+        level = pd.to_numeric(boundaries["admin_level"], errors="coerce")
+        return boundaries.geometry.iloc[level.to_numpy().argsort()[0]]
+
+    def features_from_place(self, place, tags):
+        polygon = self.place_polygon(place)
+        gdf = self.query(tags, polygon.bounds)
+        return gdf[gdf.intersects(polygon)]
@@ -0,0 +1,111 @@
+"""Drop-in replacements for osmnx's features_from_place/features_from_bbox.
+
+If the CALGARY_OSM_EXTRACT environment variable points to a local .osm.pbf
+or .osm extract (for example one from https://download.geofabrik.de/ cut to
+Calgary with `osmium extract`), queries are answered from that file instead
+of downloading from Overpass. Downloaded results are cached on disk for a
+day, see calgary_osm/query_cache.py.
+"""
+
+import os
+import threading
+
+import pandas as pd
+
+from calgary_osm import query_cache
+
+EXTRACT_ENV = "CALGARY_OSM_EXTRACT"
+
+_store = None
+# progress.py queries from two threads, only one of them may build the index
+_store_lock = threading.Lock()
+
+
+def use_extract(path):
+    global _store
+    from calgary_osm.extract import LocalStore
+
+    _store = LocalStore(path)
+    return _store
+
+
+def local_store():
+    if _store is None and os.environ.get(EXTRACT_ENV):
+        with _store_lock:
+            if _store is None:
+                use_extract(os.environ[EXTRACT_ENV])
+    return _store
+
+
+def features_from_place(place, tags):
+    store = local_store()
+    if store is not None:
+        return store.features_from_place(place, tags)
+    import osmnx as ox
+
+    return query_cache.cached_query(
+        "place", place, tags, ox.features.features_from_place
+    )
+
+
+def features_from_bbox(bbox, tags):
+    store = local_store()
+    if store is not None:
+        return store.features_from_bbox(bbox, tags)
+    import osmnx as ox
+
+    return query_cache.cached_query("bbox", bbox, tags, ox.features.features_from_bbox)
+
+
+def merge_tags(tag_filters):
+    """Combine several osmnx tag filters into one that matches all of them."""
+    merged = {}
+    for tags in tag_filters:
+        for key, value in tags.items():
+            if merged.get(key) is True or value is True:
+                merged[key] = True
+                continue
+            values = merged.get(key, [])
+            for v in [value] if isinstance(value, str) else value:
+                if v not in values:
+                    values.append(v)
+            merged[key] = values
+    return merged
+
+
+def matches(gdf, tags):
+    """Which features match an osmnx tag filter (any of its tags)."""
+    mask = pd.Series(False, index=gdf.index)
+    for key, value in tags.items():
+        if key not in gdf.columns:
+            continue
+        if value is True:
+            mask |= gdf[key].notnull()
+        else:
+            mask |= gdf[key].isin([value] if isinstance(value, str) else value)
+    return mask
+
+
+def drop_empty_columns(gdf):
+    """Drop the columns without any values, except for the geometry."""
+    empty = [
+        column
+        for column in gdf.columns
+        if column != gdf.geometry.name and gdf[column].isna().all()
+    ]
+    return gdf.drop(columns=empty)
+
+
+def features_from_bbox_layers(bbox, layers):
+    """Get the features for several tag filters with a single query.
+
+    layers maps names to osmnx tag filters. Returns a dict with the same names
+    and the features that match each filter, with only the columns that
+    aren't empty for that layer, like separate features_from_bbox() calls
+    would.
+    """
+    gdf = features_from_bbox(bbox, merge_tags(layers.values()))
+    return {
+        name: drop_empty_columns(gdf[matches(gdf, tags)])
+        for name, tags in layers.items()
+    }
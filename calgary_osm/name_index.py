@@ -0,0 +1,45 @@
+"""Approximate string matching for street names with a trigram index.
+
+Names are scored by the Dice coefficient of their trigram sets (like
+PostgreSQL's pg_trgm), which is computed for every indexed name at once by
+counting shared trigrams with numpy instead of comparing names pairwise.
+"""
+
+from collections import defaultdict
+
+import numpy as np
+
+
+def trigrams(name):
+    padded = f"  {name} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    def __init__(self, names):
+        self.names = sorted(set(names))
+        postings = defaultdict(list)
+        for i, name in enumerate(self.names):
+            for trigram in trigrams(name):
+                postings[trigram].append(i)
+        self.postings = {
+            trigram: np.array(ids, dtype=np.int32) for trigram, ids in postings.items()
+        }
+        self.sizes = np.array([len(trigrams(name)) for name in self.names])
+
+    def query(self, name, k=3, min_score=0.5):
+        """Return up to k (name, score) pairs closest to name, best first."""
+        query_trigrams = trigrams(name)
+        hits = [self.postings[t] for t in query_trigrams if t in self.postings]
+        if not hits:
+            return []
+        shared = np.bincount(np.concatenate(hits), minlength=len(self.names))
+        scores = 2 * shared / (self.sizes + len(query_trigrams))
+        if len(scores) > k:
+            best = np.argpartition(-scores, k)[:k]
+        else:
+            best = np.arange(len(scores))
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return [
+            (self.names[i], float(scores[i])) for i in best if scores[i] >= min_score
+        ]
@@ -0,0 +1,115 @@
+"""On-disk cache of OSM feature query results shared by all the scripts.
+
+Results are stored under a hash of the query (place or bbox plus the tag
+filter), expire after CALGARY_OSM_CACHE_TTL seconds and the least recently
+used ones are deleted once the cache grows past CALGARY_OSM_CACHE_SIZE_MB.
+"""
+
+import atexit
+import hashlib
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+CACHE_DIR = Path(
+    os.environ.get(
+        "CALGARY_OSM_CACHE_DIR", Path.home() / ".cache" / "calgary_osm" / "queries"
+    )
+)
+TTL = float(os.environ.get("CALGARY_OSM_CACHE_TTL", 24 * 60 * 60))
+MAX_SIZE = float(os.environ.get("CALGARY_OSM_CACHE_SIZE_MB", 2048)) * 1024 * 1024
+
+stats = {"hits": 0, "misses": 0}
+
+
+def normalize_tags(tags):
+    return {
+        key: value if isinstance(value, (bool, str)) else sorted(value)
+        for key, value in sorted(tags.items())
+    }
+
+
+def query_key(kind, query, tags):
+    if not isinstance(query, str):
+        query = [float(x) for x in query]
+    key = json.dumps(
+        {"kind": kind, "query": query, "tags": normalize_tags(tags)}, sort_keys=True
+    )
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def cache_path(key):
+    return CACHE_DIR / f"{key}.pkl"
+
+
+def get(key):
+    path = cache_path(key)
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    # mtime is when the result was downloaded, atime when it was last used
+    if time.time() - stat.st_mtime > TTL:
+        path.unlink(missing_ok=True)
+        return None
+    try:
+        gdf = pd.read_pickle(path)
+    except Exception as e:
+        print(f"[WARN] Ignoring unreadable cache file {path}: {e}", file=sys.stderr)
+        return None
+    os.utime(path, (time.time(), stat.st_mtime))
+    return gdf
+
+
+def put(key, gdf):
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    path = cache_path(key)
+    tmp_path = path.with_suffix(".tmp")
+    gdf.to_pickle(tmp_path)
+    tmp_path.replace(path)
+    evict()
+
+
+def evict():
+    files = []
+    for path in CACHE_DIR.glob("*.pkl"):
+        try:
+            files.append((path, path.stat()))
+        except FileNotFoundError:
+            pass
+    size = sum(stat.st_size for _, stat in files)
+    now = time.time()
+    # Expired first, then least recently used
+    files.sort(key=lambda f: (now - f[1].st_mtime <= TTL, f[1].st_atime))
+    for path, stat in files:
+        if size <= MAX_SIZE and now - stat.st_mtime <= TTL:
+            break
+        path.unlink(missing_ok=True)
+        size -= stat.st_size
+
+
+def cached_query(kind, query, tags, fetch):
+    """Return the cached result of fetch(query, tags) or call it and cache it."""
+    key = query_key(kind, query, tags)
+    gdf = get(key)
+    if gdf is not None:
+        stats["hits"] += 1
+        return gdf
+    stats["misses"] += 1
+    gdf = fetch(query, tags)
+    put(key, gdf)
+    return gdf
+
+
+@atexit.register
+def print_stats():
+    if stats["hits"] or stats["misses"]:
+        print(
+            f"[INFO] OSM query cache: {stats['hits']} hits, {stats['misses']} misses"
+            f" ({CACHE_DIR})",
+            file=sys.stderr,
+        )
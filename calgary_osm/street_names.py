@@ -0,0 +1,198 @@
+"""City of Calgary and OpenStreetMap street name canonicalization.
+
+coc_street_names() turns the City's (name, type, quadrant) columns into the
+name OSM would use and join_key() reduces a street name from either dataset
+to a key that ignores the differences we don't care about (St. vs Saint,
+accents, apostrophes, long quadrants, etc.).
+"""
+
+import re
+import unicodedata
+from functools import lru_cache
+
+import pandas as pd
+
+# https://data.calgary.ca/Base-Maps/Parcel-Address/9zvu-p8uz/about_data
+STREET_TYPES = {
+    "AL": "Alley",
+    "AV": "Avenue",
+    "BA": "Bay",
+    "BV": "Boulevard",
+    "CA": "Cape",
+    "CE": "Centre",
+    "CI": "Circle",
+    "CL": "Close",
+    "CM": "Common",
+    "CO": "Court",
+    "CR": "Crescent",
+    "CV": "Cove",
+    "DR": "Drive",
+    "GA": "Gate",
+    "GD": "Gardens",
+    "GR": "Green",
+    "GV": "Grove",
+    "HE": "Heath",
+    "HI": "Highway",
+    "HL": "Hill",
+    "HT": "Heights",
+    "IS": "Island",
+    "LD": "Landing",
+    "LI": "Link",
+    "LN": "Lane",
+    "ME": "Mews",
+    "MR": "Manor",
+    "MT": "Mount",
+    "PA": "Park",
+    "PH": "Path",
+    "PL": "Place",
+    "PR": "Parade",
+    "PS": "Passage",
+    "PT": "Point",
+    "PY": "Parkway",
+    "PZ": "Plaza",
+    "RD": "Road",
+    "RI": "Rise",
+    "RO": "Row",
+    "SQ": "Square",
+    "ST": "Street",
+    "TC": "Terrace",
+    "TR": "Trail",
+    "VI": "Villas",
+    "VW": "View",
+    "WK": "Walk",
+    "WY": "Way",
+}
+
+QUADRANTS = {
+    "southwest": "sw",
+    "southeast": "se",
+    "northwest": "nw",
+    "northeast": "ne",
+    "south-west": "sw",
+    "south-east": "se",
+    "north-west": "nw",
+    "north-east": "ne",
+}
+
+# Block numbers that OSM sometimes puts in front of street names,
+# like "400 Abalone Place NE"
+BLOCK_PREFIXES = [
+    f"{i}00 " for i in [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 20, 30, 40]
+]
+
+# Special cases for City of Calgary street names, applied in order to the
+# upper case name. Everything else is just title cased.
+COC_NAME_RULES = [
+    (r"^ST MORITZ", "St. Moritz"),
+    (r"^ST MONICA", "St. Monica"),
+    (r"^ST ", "Saint "),
+    (r"^TWELVE MI COULEE", "Twelve Mile Coulee"),
+    (r"^SUNCANYON\b", "Sun Canyon"),
+    (r"\bMT\b", "Mount"),
+]
+
+# Streets that City addresses use but that aren't the name of any way in OSM
+# (OSM has "Centre Street N" and "Centre Street S", etc.)
+OSM_STREET_NAMES = [
+    "Centre Street NE",
+    "Centre Street NW",
+    "Centre Street SE",
+    "Centre Street SW",
+    "Centre Avenue NE",
+    "Centre Avenue NW",
+    "Centre Avenue SE",
+    "Centre Avenue SW",
+    "Harvest Hills Boulevard NE",
+    "Harvest Hills Boulevard NW",
+    "Trans-Canada Highway SW",
+    "Trans-Canada Highway NW",
+    "Métis Trail NE",
+    "Métis Trail NW",
+]
+
+# Highways whose ways are named without a quadrant in OSM, addresses on
+# them still have one
+NO_QUADRANT_STREETS = {"trans canada highway", "tsuutina trail"}
+
+# Applied in order to the lower case name
+JOIN_KEY_RULES = [
+    (r"^saint ", "st "),
+    (r"\bst\. ", "st "),
+    (r"^dr\. ", "dr "),
+    (r"['’]", ""),
+    (r"-", " "),
+    (r"\s+", " "),
+]
+
+
+def strip_block_prefix(name):
+    for prefix in BLOCK_PREFIXES:
+        # We keep "100 Avenue" or "100 Street" as that might be the actual name
+        if name.startswith(prefix) and not (
+            name.startswith(prefix + "Avenue") or name.startswith(prefix + "Street")
+        ):
+            return name[len(prefix) :]
+    return name
+
+
+def strip_accents(name):
+    return "".join(
+        c for c in unicodedata.normalize("NFKD", name) if not unicodedata.combining(c)
+    )
+
+
+@lru_cache(maxsize=None)
+def join_key(name, strip_block=False):
+    if strip_block:
+        name = strip_block_prefix(name)
+    key = strip_accents(name.lower()).strip()
+    for pattern, replacement in JOIN_KEY_RULES:
+        key = re.sub(pattern, replacement, key)
+    base, _, quadrant = key.rpartition(" ")
+    if quadrant in QUADRANTS:
+        key = f"{base} {QUADRANTS[quadrant]}"
+    return key
+
+
+@lru_cache(maxsize=None)
+def way_key(name):
+    """join_key() for matching City street centrelines to OSM ways, which
+    ignores the quadrant of the NO_QUADRANT_STREETS."""
+    key = join_key(name)
+    base, _, quadrant = key.rpartition(" ")
+    if base in NO_QUADRANT_STREETS and quadrant in QUADRANTS.values():
+        return base
+    return key
+
+
+def join_keys(names, key=join_key, **kwargs):
+    """key() of every name in a Series, computed once per unique name."""
+    return names.map({name: key(name, **kwargs) for name in names.dropna().unique()})
+
+
+def coc_street_names(name, street_type, quadrant, numeric_preface=None):
+    """Build OSM style names from City of Calgary street name columns.
+
+    name is the street name, street_type the abbreviation from
+    STREET_TYPES and quadrant "NE", "NW", "SE" or "SW".
+    """
+    # There's only a few thousand different street names, so normalize
+    # each of them once and map the result back to every row
+    unique = pd.Series(name.unique())
+    normalized = unique.str.upper()
+    for pattern, replacement in COC_NAME_RULES:
+        normalized = normalized.str.replace(pattern, replacement, regex=True)
+    normalized = normalized.str.title()
+    full_name = (
+        name.map(dict(zip(unique, normalized)))
+        + " "
+        + street_type.map(STREET_TYPES)
+        + " "
+        + quadrant
+    )
+    if numeric_preface is not None:
+        has_preface = numeric_preface.notnull() & (numeric_preface != "")
+        full_name = full_name.where(
+            ~has_preface, numeric_preface.astype(str) + " " + full_name
+        )
+    return full_name
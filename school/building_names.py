@@ -10,12 +10,13 @@
 # if the names are different, it prints them
 
 import geopandas as gpd
-import osmnx as ox
+
+from calgary_osm import features
 
 bbox = [-114.3387482, 50.8341488, -113.8194342, 51.2270627]
 
-buildings = ox.features.features_from_bbox(bbox, {"building": "school"})
-areas = ox.features.features_from_bbox(bbox, {"amenity": "school"})
+buildings = features.features_from_bbox(bbox, {"building": "school"})
+areas = features.features_from_bbox(bbox, {"amenity": "school"})
 
 
 buildings = buildings[buildings["name"].notnull()]
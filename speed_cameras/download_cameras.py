@@ -3,13 +3,16 @@ import re
 import json
 
 import requests
-from geopy.distance import geodesic
 
+from calgary_osm.conflate import conflate_features, find_duplicates
 
 # https://data.calgary.ca/Health-and-Safety/Intersection-Safety-Cameras/dv2f-necx/about_data
 # You have to manually exit the descriptions for the cameras to get the direction
 FILENAME = "Intersection Safety Cameras_20250221.geojson"
 
+# Cameras closer than this (in meters) are considered the same camera
+MATCH_DISTANCE = 100
+
 
 def load_geojson(file_path):
     """Load a GeoJSON file and return the feature collection."""
@@ -54,20 +57,18 @@ def download_osm_cameras():
             sys.exit(1)
 
         # Check for overlapping/duplicate cameras
-        for i, osm_camera in enumerate(elements):
-            for other_camera in elements[i + 1 :]:
-                if osm_camera == other_camera:
-                    continue
-                osm_coord = (osm_camera["lat"], osm_camera["lon"])
-                other_coord = (other_camera["lat"], other_camera["lon"])
-                if geodesic(osm_coord, other_coord).meters < 100 and (
-                    osm_camera["tags"]["direction"] == other_camera["tags"]["direction"]
-                ):
-                    print(
-                        f"OSM cameras overlap: {osm_camera} and {other_camera}",
-                        file=sys.stderr,
-                    )
-                    sys.exit(1)
+        first, second, _ = find_duplicates(
+            [(osm_camera["lon"], osm_camera["lat"]) for osm_camera in elements],
+            MATCH_DISTANCE,
+            keys=[osm_camera["tags"]["direction"] for osm_camera in elements],
+        )
+        for i, j in zip(first, second):
+            print(
+                f"OSM cameras overlap: {elements[i]} and {elements[j]}",
+                file=sys.stderr,
+            )
+        if len(first):
+            sys.exit(1)
 
         return elements
     else:
@@ -116,28 +117,36 @@ def quantize_direction(direction):
 coc_cameras = parse_description(load_geojson(FILENAME))
 osm_cameras = download_osm_cameras()
 
-existing_features = []
-new_features = []
-
-for feature in coc_cameras:
+osm_features = [
+    {
+        "type": "Feature",
+        "properties": osm_camera["tags"],
+        "geometry": {
+            "type": "Point",
+            "coordinates": [osm_camera["lon"], osm_camera["lat"]],
+        },
+    }
+    for osm_camera in osm_cameras
+]
+collections, matches = conflate_features(
+    coc_cameras,
+    osm_features,
+    MATCH_DISTANCE,
+    key=lambda feature: feature["properties"]["direction"],
+    target_key=lambda feature: quantize_direction(feature["properties"]["direction"]),
+)
+for feature, osm_feature, _ in matches:
     coords = feature["geometry"]["coordinates"]
-    coords = (coords[1], coords[0])  # my favorite part of working with geo data
-    direction = feature["properties"]["direction"]
-    exists = False
-    for osm_camera in osm_cameras:
-        osm_coord = (osm_camera["lat"], osm_camera["lon"])
-        osm_direction = osm_camera["tags"]["direction"]
-        if (
-            geodesic(osm_coord, coords).meters < 100
-            and quantize_direction(osm_direction) == direction
-        ):
-            print(f"{coords} already exist in OSM at {osm_coord}", file=sys.stderr)
-            exists = True
-            break
-    if not exists:
-        new_features.append(feature)
-    else:
-        existing_features.append(feature)
+    osm_coord = osm_feature["geometry"]["coordinates"]
+    print(
+        f"{(coords[1], coords[0])} already exist in OSM at {(osm_coord[1], osm_coord[0])}",
+        file=sys.stderr,
+    )
+
+existing_features = collections["existing"]["features"]
+new_features = collections["new"]["features"]
+# Cameras that are close to an OSM camera that was matched to another City camera
+ambiguous_features = collections["ambiguous"]["features"]
 
 
 def to_osm(features):
@@ -157,12 +166,18 @@ existing_fc = {
 
 new_fc = {"type": "FeatureCollection", "features": to_osm(new_features)}
 
+ambiguous_fc = {"type": "FeatureCollection", "features": to_osm(ambiguous_features)}
+
 with open("existing_cameras.geojson", "w") as f:
     json.dump(existing_fc, f, indent=2)
 
 with open("new_cameras.geojson", "w") as f:
     json.dump(new_fc, f, indent=2)
 
+with open("ambiguous_cameras.geojson", "w") as f:
+    json.dump(ambiguous_fc, f, indent=2)
+
 
 print(f"Existing cameras: {len(existing_features)}")
 print(f"New cameras: {len(new_features)}")
+print(f"Ambiguous cameras: {len(ambiguous_features)}")
@@ -2,65 +2,36 @@
 # and compares them to find streets that are in one but not the other
 # and vice versa.
 # Outputs two GeoJSON files: osm_not_in_coc.geojson and coc_not_in_osm.geojson
+# With --spatial it also compares each City street segment to the OSM ways near it
 
 import sys
-import difflib
+from argparse import ArgumentParser
 
 import geopandas as gpd
-import osmnx as ox
 
+from calgary_osm import features
+from calgary_osm.name_index import TrigramIndex
+from calgary_osm.street_names import coc_street_names, join_keys, way_key
+from spatial_names import match_segments
+
+args = ArgumentParser()
+args.add_argument(
+    "--spatial",
+    action="store_true",
+    help="also check that each City street segment has an OSM way with the same name nearby",
+)
+args.add_argument(
+    "--distance",
+    type=float,
+    default=20,
+    help="how far (in meters) to look for OSM ways with --spatial",
+)
+args = args.parse_args()
 
 COC_FILENAME = "Street Centreline.geojson"
 
-street_types = {
-    "AL": "Alley",
-    "AV": "Avenue",
-    "BA": "Bay",
-    "BV": "Boulevard",
-    "CA": "Cape",
-    "CE": "Centre",
-    "CI": "Circle",
-    "CL": "Close",
-    "CM": "Common",
-    "CO": "Court",
-    "CR": "Crescent",
-    "CV": "Cove",
-    "DR": "Drive",
-    "GA": "Gate",
-    "GD": "Gardens",
-    "GR": "Green",
-    "GV": "Grove",
-    "HE": "Heath",
-    "HI": "Highway",
-    "HL": "Hill",
-    "HT": "Heights",
-    "IS": "Island",
-    "LD": "Landing",
-    "LI": "Link",
-    "LN": "Lane",
-    "ME": "Mews",
-    "MR": "Manor",
-    "MT": "Mount",
-    "PA": "Park",
-    "PH": "Path",
-    "PL": "Place",
-    "PR": "Parade",
-    "PS": "Passage",
-    "PT": "Point",
-    "PY": "Parkway",
-    "PZ": "Plaza",
-    "RD": "Road",
-    "RI": "Rise",
-    "RO": "Row",
-    "SQ": "Square",
-    "ST": "Street",
-    "TC": "Terrace",
-    "TR": "Trail",
-    "VI": "Villas",
-    "VW": "View",
-    "WK": "Walk",
-    "WY": "Way",
-}
+# How many of the closest names to suggest for every missing name
+SUGGESTIONS = 3
 
 # load Street Centreline.geojson file
 coc = gpd.read_file(COC_FILENAME)
@@ -70,44 +41,16 @@ coc = coc[(coc["name"].notnull()) & (coc["octant"].notnull())]
 # print(coc.head())
 
 
-def to_osm_name(row):
-    name = (
-        row["name"].title()
-        + " "
-        + street_types[row["street_type"]]
-        + " "
-        + row["octant"]
-    )
-    if name.startswith("Suncanyon "):
-        name = "Sun Canyon " + name[len("Suncanyon ") :]
-    if name.startswith("Mt "):
-        name = "Mount " + name[len("Mt ") :]
-    name = name.replace(" Mt ", " Mount ")
-    if row["numeric_preface"]:
-        name = row["numeric_preface"] + " " + name
-    return name
-
-
-def coc_special_cases(name):
-    if name.startswith("martha's "):
-        name = "marthas " + name[len("martha's ") :]
-    if name == "twelve mi coulee road nw":
-        name = "twelve mile coulee road nw"
-    if name.startswith("st georges "):
-        name = "st george's " + name[len("st georges ") :]
-    if "trans canada hi" in name:
-        name = "trans-canada highway"
-    return name
-
-
-coc["osm_name"] = coc.apply(to_osm_name, axis=1)
-coc["join_key"] = coc["osm_name"].str.lower().apply(coc_special_cases)
+coc["osm_name"] = coc_street_names(
+    coc["name"], coc["street_type"], coc["octant"], coc["numeric_preface"]
+)
+coc["join_key"] = join_keys(coc["osm_name"], key=way_key)
 
 # rename column so iD shows the name when loading the file
 coc["_name"] = coc["name"]
 coc["name"] = coc["osm_name"]
 
-osm = ox.features_from_place(
+osm = features.features_from_place(
     "Calgary, Alberta, Canada",
     {
         "highway": [
@@ -136,86 +79,88 @@ osm = osm[["name", "geometry", "highway"]]
 
 print("Loaded data", len(coc), len(osm), file=sys.stderr)
 
-quads = {
-    "southwest": "sw",
-    "southeast": "se",
-    "northwest": "nw",
-    "northeast": "ne",
-    "south-west": "sw",
-    "south-east": "se",
-    "north-west": "nw",
-    "north-east": "ne",
-}
-
-
-def osm_name_to_join_key(name):
-    # for i in [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 20, 30, 40]:
-    #     prefix = f"{i}00 "
-    #     if name.startswith(prefix) and name.split()[1] not in ["Street", "Avenue"]:
-    #         name = name[len(prefix) :]
-    #         break
-    name = name.lower()
-    if name.startswith("saint "):
-        name = "st " + name[len("saint ") :]
-    if name.startswith("st. "):
-        name = "st " + name[len("st. ") :]
-    name = name.replace(" st. ", " st ")
-    if name.startswith("dr. "):
-        name = "dr " + name[len("dr. ") :]
-    if name.startswith("métis "):
-        name = "metis " + name[len("métis ") :]
-    # TODO: remove this
-    if name.startswith("martha's "):
-        name = "marthas " + name[len("martha's ") :]
-    for longquad, quad in quads.items():
-        if name.endswith(f" {longquad}"):
-            name = name[: -len(longquad)] + quad
-            break
-    if name == "tsuut'ina trail":
-        name = "tsuut'ina trail sw"
-    return name.lower()
-
-
-osm["join_key"] = osm["name"].apply(osm_name_to_join_key)
+osm["join_key"] = join_keys(osm["name"], key=way_key)
 
 
 joined = coc.merge(osm, on="join_key", how="left", suffixes=("_coc", "_osm"))
 
 # save just the rows in osm_named_streets.geojson that are not in the joined dataframe
-osm_not_in_coc = osm[~osm["join_key"].isin(joined["join_key"])]
-osm_not_in_coc.to_file("osm_not_in_coc.geojson", driver="GeoJSON")
+osm_not_in_coc = osm[~osm["join_key"].isin(joined["join_key"])].copy()
 
 # do it the other way around and
 # save just the rows in Street Centreline_20250225.geojson that are not in the joined dataframe
 joined = osm.merge(coc, on="join_key", how="left", suffixes=("_osm", "_coc"))
-coc_not_in_osm = coc[~coc["join_key"].isin(joined["join_key"])]
-coc_not_in_osm.to_file("coc_not_in_osm.geojson", driver="GeoJSON")
+coc_not_in_osm = coc[~coc["join_key"].isin(joined["join_key"])].copy()
 
 osm_keys = set(osm_not_in_coc["join_key"])
 coc_keys = set(coc_not_in_osm["join_key"])
 
-# print(f"{len(osm_keys)} OSM keys not in CoC", file=sys.stderr)
-# for key in sorted(osm_keys):
-#     name = osm[osm["join_key"] == key].iloc[0]["name"]
-#     # find the closest match in coc_keys
-#     closest = difflib.get_close_matches(key, coc_keys, n=3)
-#     print(f"{name} ({key})", file=sys.stderr)
-#     for c in closest:
-#         c_name = coc[coc["join_key"] == c].iloc[0]["osm_name"]
-#         print(f"    {c_name} ({c})", file=sys.stderr)
-#
-#
-# print()
-# print(f"{len(coc_keys)} CoC keys not in OSM", file=sys.stderr)
-# for key in sorted(coc_keys):
-#     name = coc[coc["join_key"] == key].iloc[0]["osm_name"]
-#     # find the closest match in coc_keys
-#     closest = difflib.get_close_matches(key, osm_keys, n=3)
-#     print(f"{name} ({key})", file=sys.stderr)
-#     for c in closest:
-#         c_name = osm[osm["join_key"] == c].iloc[0]["name"]
-#         print(f"    {c_name} ({c})", file=sys.stderr)
+osm_key_names = osm.drop_duplicates("join_key").set_index("join_key")["name"]
+coc_key_names = coc.drop_duplicates("join_key").set_index("join_key")["osm_name"]
+
+
+def add_suggestions(gdf, keys, names, other_keys, other_names, label):
+    # find the closest matches in the other dataset's unmatched keys
+    index = TrigramIndex(other_keys)
+    suggestions = {}
+    print(f"{len(keys)} {label}", file=sys.stderr)
+    for key in sorted(keys):
+        closest = index.query(key, k=SUGGESTIONS)
+        suggestions[key] = closest
+        print(f"{names[key]} ({key})", file=sys.stderr)
+        for c, score in closest:
+            print(f"    {other_names[c]} ({c}) {score:.2f}", file=sys.stderr)
+    best = {key: closest[0] for key, closest in suggestions.items() if closest}
+    gdf["suggestion"] = gdf["join_key"].map(
+        {key: other_names[c] for key, (c, _) in best.items()}
+    )
+    gdf["suggestion_score"] = gdf["join_key"].map(
+        {key: round(score, 3) for key, (_, score) in best.items()}
+    )
+    gdf["suggestions"] = gdf["join_key"].map(
+        {
+            key: "; ".join(other_names[c] for c, _ in closest)
+            for key, closest in suggestions.items()
+            if closest
+        }
+    )
+    return gdf
+
+
+osm_not_in_coc = add_suggestions(
+    osm_not_in_coc,
+    osm_keys,
+    osm_key_names,
+    coc_keys,
+    coc_key_names,
+    "OSM keys not in CoC",
+)
+print(file=sys.stderr)
+coc_not_in_osm = add_suggestions(
+    coc_not_in_osm,
+    coc_keys,
+    coc_key_names,
+    osm_keys,
+    osm_key_names,
+    "CoC keys not in OSM",
+)
+
+osm_not_in_coc.to_file("osm_not_in_coc.geojson", driver="GeoJSON")
+coc_not_in_osm.to_file("coc_not_in_osm.geojson", driver="GeoJSON")
 
 print()
 print(f"{len(coc_keys)} CoC street names not in OSM", file=sys.stderr)
 print(f"{len(osm_keys)} OSM street names not in CoC", file=sys.stderr)
+
+if args.spatial:
+    segments = match_segments(coc, osm, args.distance)
+    segments.to_file("coc_segments_spatial.geojson", driver="GeoJSON")
+    segments[segments["match_status"] == "mismatch"].to_file(
+        "coc_segments_mismatch.geojson", driver="GeoJSON"
+    )
+    segments[segments["match_status"] == "missing"].to_file(
+        "coc_segments_missing.geojson", driver="GeoJSON"
+    )
+    print(file=sys.stderr)
+    for status, count in segments["match_status"].value_counts().items():
+        print(f"{count} CoC street segments: {status}", file=sys.stderr)
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+
+from calgary_osm.crs import PROJECTED_CRS
+
+
+def match_segments(coc, osm, distance=20):
+    """Compare every City centreline segment's name to the OSM ways near it.
+
+    Both GeoDataFrames need a "join_key" column. Adds these columns to a copy
+    of coc:
+
+    - match_status: "match" if an OSM way within distance meters has the same
+      join key, "mismatch" if there are OSM ways nearby but none with the same
+      name and "missing" if there are no named OSM ways nearby at all
+    - nearby_osm_names: names of the OSM ways nearby (for mismatches)
+    """
+    coc_projected = coc.geometry.to_crs(PROJECTED_CRS)
+    osm_projected = osm.geometry.to_crs(PROJECTED_CRS)
+
+    coc_idx, osm_idx = osm_projected.sindex.query(
+        coc_projected.values, predicate="dwithin", distance=distance
+    )
+    coc_keys = coc["join_key"].to_numpy()
+    osm_keys = osm["join_key"].to_numpy()
+    pairs = pd.DataFrame(
+        {
+            "coc": coc_idx,
+            "same": coc_keys[coc_idx] == osm_keys[osm_idx],
+            "osm_name": osm["name"].to_numpy()[osm_idx],
+        }
+    )
+
+    matched = np.zeros(len(coc), dtype=bool)
+    matched[pairs.loc[pairs["same"], "coc"].unique()] = True
+    nearby = np.zeros(len(coc), dtype=bool)
+    nearby[coc_idx] = True
+
+    coc = coc.copy()
+    coc["match_status"] = np.where(
+        matched, "match", np.where(nearby, "mismatch", "missing")
+    )
+    nearby_names = (
+        pairs[~pairs["coc"].isin(np.flatnonzero(matched))]
+        .drop_duplicates(["coc", "osm_name"])
+        .groupby("coc")["osm_name"]
+        .agg("; ".join)
+    )
+    coc["nearby_osm_names"] = nearby_names.reindex(range(len(coc))).to_numpy()
+    return coc
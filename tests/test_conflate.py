@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+from calgary_osm.conflate import conflate_features, find_duplicates, match_points
+
+# About 11 m and 110 m north of ORIGIN
+ORIGIN = (-114.07, 51.03)
+NORTH_11M = (-114.07, 51.0301)
+NORTH_110M = (-114.07, 51.031)
+
+
+def test_competing_sources():
+    # Both City points are near the only OSM point, the closer one gets it
+    matched, status, distances = match_points(
+        [NORTH_11M, ORIGIN, NORTH_110M], [ORIGIN], 100
+    )
+    assert matched.tolist() == [-1, 0, -1]
+    assert status.tolist() == ["ambiguous", "existing", "new"]
+    assert distances[1] == 0
+    assert np.isnan(distances[[0, 2]]).all()
+
+
+def test_assignment_is_one_to_one():
+    matched, status, _ = match_points([ORIGIN, NORTH_11M], [NORTH_11M, ORIGIN], 100)
+    assert matched.tolist() == [1, 0]
+    assert status.tolist() == ["existing", "existing"]
+
+
+def test_keys():
+    matched, status, _ = match_points(
+        [ORIGIN, ORIGIN],
+        [ORIGIN, NORTH_11M],
+        100,
+        source_keys=[90, 180],
+        target_keys=[180, 90],
+    )
+    # The closest points don't have the same key
+    assert matched.tolist() == [1, 0]
+    assert status.tolist() == ["existing", "existing"]
+
+
+def test_compare():
+    items = [{"name": "A"}, {"name": "B"}]
+    matched, _, _ = match_points(
+        [ORIGIN],
+        [ORIGIN, NORTH_11M],
+        100,
+        compare=lambda s, t: s["name"] == t["name"],
+        source_items=[{"name": "B"}],
+        target_items=items,
+    )
+    assert matched.tolist() == [1]
+
+
+@pytest.mark.parametrize("source, target", [([], [ORIGIN]), ([ORIGIN], []), ([], [])])
+def test_empty(source, target):
+    matched, status, distances = match_points(source, target, 100)
+    assert matched.tolist() == [-1] * len(source)
+    assert status.tolist() == ["new"] * len(source)
+    assert len(distances) == len(source)
+
+
+def test_find_duplicates():
+    i, j, _ = find_duplicates(
+        [ORIGIN, NORTH_11M, NORTH_110M, ORIGIN], 100, keys=[0, 0, 0, 90]
+    )
+    assert list(zip(i.tolist(), j.tolist())) == [(0, 1)]
+
+
+def point(lonlat, direction):
+    return {
+        "type": "Feature",
+        "properties": {"direction": direction},
+        "geometry": {"type": "Point", "coordinates": list(lonlat)},
+    }
+
+
+def test_conflate_features():
+    source = [point(ORIGIN, 0), point(NORTH_11M, 0), point(NORTH_110M, 0)]
+    target = [point(ORIGIN, 0)]
+    collections, matches = conflate_features(
+        source, target, 100, key=lambda f: f["properties"]["direction"]
+    )
+    assert {s: len(c["features"]) for s, c in collections.items()} == {
+        "existing": 1,
+        "new": 1,
+        "ambiguous": 1,
+    }
+    assert matches == [(source[0], target[0], 0)]
@@ -0,0 +1,74 @@
+import geopandas as gpd
+import pytest
+import shapely
+
+from diff_snapshots import diff_snapshots
+
+pytest.importorskip("pyarrow")
+
+
+def box(x, y, size=0.0002):
+    return shapely.box(x, y, x + size, y + size)
+
+
+def write_snapshot(path, geometries):
+    gpd.GeoDataFrame(
+        {"bldg_code_desc": ["Residential Roof Outline"] * len(geometries)},
+        geometry=geometries,
+        crs="EPSG:4326",
+    ).to_file(path)
+    return path
+
+
+def read_changes(directory):
+    return {
+        str(path.relative_to(directory)): len(gpd.read_file(path))
+        for path in sorted(directory.rglob("*.geojson"))
+    }
+
+
+def test_diff(tmp_path):
+    # Self-intersecting "bowtie" ring
+    bowtie = shapely.Polygon(
+        [(-114.05, 51.03), (-114.0498, 51.0302), (-114.0498, 51.03), (-114.05, 51.0302)]
+    )
+    old = write_snapshot(
+        tmp_path / "old.geojson",
+        [
+            box(-114.07, 51.03),
+            box(-114.06, 51.03),
+            box(-114.04, 51.03),
+            # Outside of every neighborhood
+            box(-113.5, 51.03),
+            bowtie,
+        ],
+    )
+    new = write_snapshot(
+        tmp_path / "new.geojson",
+        [
+            # Unchanged, moved by a fraction of its width and new
+            box(-114.07, 51.03),
+            box(-114.05998, 51.03),
+            box(-114.03, 51.03),
+            # Much larger than the bowtie it covers
+            box(-114.0501, 51.0299, size=0.001),
+        ],
+    )
+    neighborhoods = gpd.GeoDataFrame(
+        {"name": ["Mission/Cliff Bungalow"]},
+        geometry=[shapely.box(-114.1, 51.0, -114.0, 51.1)],
+        crs="EPSG:4326",
+    )
+
+    summary = diff_snapshots(old, new, tmp_path / "diff", neighborhoods)
+
+    assert summary.to_dict("index") == {
+        "Mission/Cliff Bungalow": {"added": 2, "modified": 1, "removed": 2},
+        "outside_calgary": {"added": 0, "modified": 0, "removed": 1},
+    }
+    assert read_changes(tmp_path / "diff") == {
+        "added/Mission_Cliff Bungalow.geojson": 2,
+        "modified/Mission_Cliff Bungalow.geojson": 1,
+        "removed/Mission_Cliff Bungalow.geojson": 2,
+        "removed/outside_calgary.geojson": 1,
+    }
@@ -0,0 +1,111 @@
+import geopandas as gpd
+import pytest
+import shapely
+
+from outlines import LAYERS, export_serial
+from parallel import export_parallel
+
+
+def box(x, y, size=0.0002):
+    return shapely.box(x, y, x + size, y + size)
+
+
+@pytest.fixture
+def data():
+    # Two neighborhoods with no outlines near their shared boundary, where
+    # the serial and parallel exports can differ
+    neighborhoods = gpd.GeoDataFrame(
+        {"name": ["North", "South/East"]},
+        geometry=[
+            shapely.box(-114.2, 51.05, -114.0, 51.2),
+            shapely.box(-114.2, 50.9, -114.0, 51.05),
+        ],
+        crs="EPSG:4326",
+    )
+    outlines = gpd.GeoDataFrame(
+        {"building": ["house", "house", "garage", "house", "house"]},
+        geometry=[
+            box(-114.1, 51.1),
+            # Overlaps the first one
+            box(-114.0999, 51.1),
+            box(-114.09, 51.1),
+            box(-114.1, 51.0),
+            # Outside every neighborhood
+            box(-113.5, 51.0),
+        ],
+        crs="EPSG:4326",
+    )
+    addresses = gpd.GeoDataFrame(
+        {"addr:housenumber": ["1", "2", "3"], "addr:street": ["A Street SW"] * 3},
+        geometry=shapely.points(
+            [(-114.0899, 51.1001), (-114.0999, 51.0001), (-114.15, 51.15)]
+        ),
+        crs="EPSG:4326",
+    )
+    osm = gpd.GeoDataFrame(
+        {"building": ["yes"]}, geometry=[box(-114.1, 51.0)], crs="EPSG:4326"
+    )
+    return outlines, addresses, neighborhoods, osm
+
+
+def files(directory):
+    return {
+        str(path.relative_to(directory)): path.read_bytes()
+        for path in sorted(directory.rglob("*.geojson"))
+    }
+
+
+def test_parallel_matches_serial(tmp_path, data):
+    outlines, addresses, neighborhoods, osm = data
+    options = {"osm": osm, "qa": True, "merge": True}
+    export_serial(
+        outlines, addresses, neighborhoods, tmp_path / "serial", LAYERS, **options
+    )
+    export_parallel(
+        outlines,
+        addresses,
+        neighborhoods,
+        tmp_path / "parallel",
+        LAYERS,
+        jobs=2,
+        precision=7,
+        **options,
+    )
+    serial = files(tmp_path / "serial")
+    assert "mapped/South_East.geojson" in serial
+    assert "qa/South_East.geojson" not in serial
+    assert files(tmp_path / "parallel") == serial
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_full_export_updates_manifest(tmp_path, data, jobs):
+    outlines, addresses, neighborhoods, _ = data
+    layers = {layer: LAYERS[layer] for layer in ["neighborhoods", "addresses"]}
+
+    def export(outlines, incremental):
+        if jobs == 1:
+            export_serial(
+                outlines,
+                addresses,
+                neighborhoods,
+                tmp_path,
+                layers,
+                incremental=incremental,
+            )
+        else:
+            export_parallel(
+                outlines,
+                addresses,
+                neighborhoods,
+                tmp_path,
+                layers,
+                jobs,
+                incremental=incremental,
+            )
+        return files(tmp_path)
+
+    first = export(outlines, incremental=True)
+    moved = outlines.copy()
+    moved.geometry = moved.geometry.translate(0.0001)
+    assert export(moved, incremental=False) != first
+    assert export(outlines, incremental=True) == first
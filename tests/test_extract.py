@@ -0,0 +1,72 @@
+import shutil
+from pathlib import Path
+
+import pytest
+
+from calgary_osm.extract import LocalStore, tag_filter_sql
+
+pytest.importorskip("osmium")
+
+FIXTURE = Path(__file__).parent / "data" / "calgary.osm"
+
+
+@pytest.fixture
+def store(tmp_path):
+    # The index is written next to the extract
+    extract = tmp_path / FIXTURE.name
+    shutil.copy(FIXTURE, extract)
+    return LocalStore(extract)
+
+
+def ids(gdf):
+    return sorted(gdf.index.tolist())
+
+
+def test_tag_filter_sql():
+    where, params = tag_filter_sql(
+        {"building": True, "highway": "footway", "shop": ["bakery", "deli"]}
+    )
+    assert where == (
+        "key = ? OR (key = ? AND value = ?) OR (key = ? AND value IN (?, ?))"
+    )
+    assert params == ["building", "highway", "footway", "shop", "bakery", "deli"]
+
+
+def test_key_filter(store):
+    assert ids(store.query({"highway": True})) == [("way", 20), ("way", 21)]
+
+
+def test_value_filter(store):
+    assert ids(store.query({"highway": "footway"})) == [("way", 21)]
+    assert ids(store.query({"highway": ["footway", "path"]})) == [("way", 21)]
+
+
+def test_any_filter_matches(store):
+    gdf = store.query({"amenity": "cafe", "shop": ["bakery"]})
+    assert ids(gdf) == [("node", 1), ("node", 2)]
+    assert gdf.loc[("node", 1), "name"] == "Corner Cafe"
+
+
+def test_geometry_types(store):
+    gdf = store.query({"building": True, "highway": "residential"})
+    assert gdf.geom_type.to_dict() == {
+        ("way", 10): "Polygon",
+        ("way", 20): "LineString",
+        ("relation", 40): "MultiPolygon",
+    }
+
+
+def test_untagged_features_are_skipped(store):
+    assert ("node", 3) not in store.query({"building": True}).index
+    assert ("way", 30) not in store.query({"building": True}).index
+
+
+def test_bbox(store):
+    downtown = [-114.09, 51.02, -114.04, 51.055]
+    gdf = store.features_from_bbox(downtown, {"highway": True, "building": True})
+    assert ids(gdf) == [("way", 10), ("way", 20)]
+
+
+def test_bbox_without_matches(store):
+    gdf = store.features_from_bbox([-113.5, 50.5, -113.4, 50.6], {"highway": True})
+    assert gdf.empty
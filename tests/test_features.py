@@ -0,0 +1,53 @@
+import shutil
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from calgary_osm import extract, features
+
+FIXTURE = Path(__file__).parent / "data" / "calgary.osm"
+
+
+@pytest.fixture
+def no_store(monkeypatch):
+    monkeypatch.setattr(features, "_store", None)
+
+
+def test_store_is_built_once(monkeypatch, no_store):
+    built = []
+
+    class SlowStore:
+        def __init__(self, path):
+            built.append(path)
+            time.sleep(0.1)
+
+    monkeypatch.setattr(extract, "LocalStore", SlowStore)
+    monkeypatch.setenv(features.EXTRACT_ENV, "calgary.osm.pbf")
+    stores = []
+    threads = [
+        threading.Thread(target=lambda: stores.append(features.local_store()))
+        for _ in range(2)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert built == ["calgary.osm.pbf"]
+    assert stores[0] is stores[1]
+
+
+def test_empty_layer_keeps_geometry(tmp_path, monkeypatch, no_store):
+    pytest.importorskip("osmium")
+    path = tmp_path / FIXTURE.name
+    shutil.copy(FIXTURE, path)
+    monkeypatch.setenv(features.EXTRACT_ENV, str(path))
+    downtown = [-114.09, 51.02, -114.04, 51.055]
+    layers = features.features_from_bbox_layers(
+        downtown, {"buildings": {"building": True}, "footways": {"highway": "footway"}}
+    )
+    assert len(layers["buildings"]) == 1
+    assert "highway" not in layers["buildings"].columns
+    assert layers["footways"].empty
+    assert layers["footways"].geometry.name == "geometry"
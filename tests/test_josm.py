@@ -0,0 +1,161 @@
+import asyncio
+import json
+import os
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import geopandas as gpd
+import pytest
+import requests
+import shapely
+
+from josm import JosmClient, neighborhood_bbox, open_neighborhoods, read_bounds
+
+
+class StandInJosm(ThreadingHTTPServer):
+    """Records the Remote Control requests it gets, like JOSM would answer them."""
+
+    def __init__(self, port=0, delay=0):
+        self.requests = []
+        self.delay = delay
+        super().__init__(("127.0.0.1", port), Handler)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        if url.path == "/imagery":
+            # Slower than the other requests, they shouldn't wait for it
+            time.sleep(0.2)
+        time.sleep(self.server.delay)
+        self.server.requests.append((url.path.strip("/"), params))
+        self.send_response(200)
+        self.end_headers()
+        self.wfile.write(b"OK\r\n")
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(server):
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@pytest.fixture
+def josm():
+    server = serve(StandInJosm())
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def write_layer(folder, layer, name, geometries):
+    (folder / layer).mkdir(parents=True, exist_ok=True)
+    path = folder / layer / f"{name}.geojson"
+    gpd.GeoDataFrame(geometry=geometries, crs="EPSG:4326").to_file(path)
+    return path
+
+
+@pytest.fixture
+def folder(tmp_path):
+    write_layer(tmp_path, "addresses", "MISSION", [shapely.Point(-114.07, 51.03)])
+    write_layer(
+        tmp_path,
+        "neighborhoods",
+        "MISSION",
+        [shapely.box(-114.08, 51.02, -114.06, 51.03)],
+    )
+    return tmp_path
+
+
+def test_open_neighborhoods(josm, folder):
+    asyncio.run(open_neighborhoods(folder, ["MISSION"], josm.url))
+    # The imagery is enabled at the same time, the files are opened in order
+    assert ("imagery", {"id": "Bing"}) in josm.requests
+    sent = [request for request in josm.requests if request[0] != "imagery"]
+    assert [command for command, _ in sent] == [
+        "open_file",
+        "open_file",
+        "load_and_zoom",
+    ]
+    assert [params["filename"] for _, params in sent[:2]] == [
+        str(folder / "addresses" / "MISSION.geojson"),
+        str(folder / "neighborhoods" / "MISSION.geojson"),
+    ]
+    bbox = sent[-1][1]
+    assert float(bbox["left"]) == pytest.approx(-114.08005)
+    assert float(bbox["top"]) == pytest.approx(51.0301)
+
+
+def test_bbox_without_index(folder):
+    bounds = read_bounds(folder)
+    assert bounds == {"addresses": {}, "neighborhoods": {}}
+    bbox = neighborhood_bbox(folder, bounds, "MISSION")
+    assert bbox == pytest.approx([-114.08005, 51.0199, -114.05995, 51.0301])
+
+
+def test_bbox_from_stale_index(folder):
+    (folder / "neighborhoods" / "bounds.json").write_text(
+        json.dumps({"BELTLINE": [-114.1, 51.03, -114.05, 51.05]})
+    )
+    bounds = read_bounds(folder)
+    assert neighborhood_bbox(folder, bounds, "MISSION") == pytest.approx(
+        [-114.08005, 51.0199, -114.05995, 51.0301]
+    )
+    assert neighborhood_bbox(folder, bounds, "HILLHURST") is None
+
+
+def test_bbox_from_outdated_index(folder):
+    index = {"MISSION": [-114.1, 51.03, -114.05, 51.05]}
+    for layer in ["addresses", "neighborhoods"]:
+        path = folder / layer / "bounds.json"
+        path.write_text(json.dumps(index))
+        os.utime(path, (0, 0))
+    bounds = read_bounds(folder)
+    assert neighborhood_bbox(folder, bounds, "MISSION") == pytest.approx(
+        [-114.08005, 51.0199, -114.05995, 51.0301]
+    )
+    # Files written before the index aren't read
+    for layer in ["addresses", "neighborhoods"]:
+        os.utime(folder / layer / "MISSION.geojson", (0, 0))
+    assert neighborhood_bbox(folder, bounds, "MISSION") == pytest.approx(
+        [-114.10005, 51.0299, -114.04995, 51.0501]
+    )
+
+
+def test_retries_until_josm_starts():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    servers = []
+    threading.Timer(0.3, lambda: servers.append(serve(StandInJosm(port)))).start()
+    client = JosmClient(f"http://127.0.0.1:{port}", retry_delay=0.1)
+    try:
+        response = asyncio.run(client.enable_imagery())
+    finally:
+        client.close()
+        for server in servers:
+            server.shutdown()
+            server.server_close()
+    assert response.status_code == 200
+
+
+def test_timeout():
+    server = serve(StandInJosm(delay=1))
+    client = JosmClient(server.url, timeout=0.1)
+    try:
+        with pytest.raises(requests.Timeout):
+            asyncio.run(client.enable_imagery())
+    finally:
+        client.close()
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,32 @@
+import geopandas as gpd
+import shapely
+
+from calgary_osm.crs import PROJECTED_CRS
+from osm_conflation import classify_outlines
+
+
+def frame(*polygons):
+    return gpd.GeoDataFrame(geometry=list(polygons), crs=PROJECTED_CRS)
+
+
+def test_classes():
+    outlines = frame(
+        shapely.box(0, 0, 10, 10),
+        shapely.box(20, 0, 30, 10),
+        shapely.box(40, 0, 50, 10),
+    )
+    osm = frame(shapely.box(0, 0, 10, 11), shapely.box(25, 0, 35, 10))
+    classes = classify_outlines(outlines, osm)
+    assert classes.tolist() == ["mapped", "conflicting", "new"]
+
+
+def test_invalid_polygons():
+    # Self-intersecting "bowtie" rings on both sides
+    bowtie = shapely.Polygon([(0, 0), (10, 10), (10, 0), (0, 10)])
+    outlines = frame(bowtie, shapely.box(20, 0, 40, 10))
+    osm = frame(
+        shapely.Polygon([(0, 0), (10, 10), (10, 0), (0, 10)]),
+        shapely.Polygon([(20, 0), (30, 10), (30, 0), (20, 10)]),
+    )
+    classes = classify_outlines(outlines, osm)
+    assert classes.tolist() == ["mapped", "conflicting"]
@@ -0,0 +1,28 @@
+import pandas as pd
+
+import progress_history
+
+
+def summary(total):
+    return pd.DataFrame(
+        {
+            "id": [1, 2],
+            "total": [total, 10],
+            "coc_ratio": [0.5, 1.0],
+            "addr_ratio": [0.25, None],
+            "sidewalk_ratio": [0.0, 0.5],
+        },
+        index=pd.Index(["BELTLINE", "MISSION"], name="name"),
+    )
+
+
+def test_runs_in_the_same_second():
+    db = progress_history.connect(":memory:")
+    first = progress_history.save_run(db, summary(100))
+    second = progress_history.save_run(db, summary(110))
+    assert first != second
+    assert progress_history.last_runs(db) == [second, first]
+
+    report = progress_history.report(db)
+    assert report.loc[1, "total_change"] == 10
+    assert report.loc[2, "total_change"] == 0
@@ -0,0 +1,29 @@
+import geopandas as gpd
+import shapely
+
+from calgary_osm.crs import PROJECTED_CRS
+from qa import check_outlines
+
+
+def outlines(*polygons):
+    return gpd.GeoDataFrame(
+        {"building": ["house"] * len(polygons)},
+        geometry=list(polygons),
+        crs=PROJECTED_CRS,
+    )
+
+
+def test_overlap():
+    gdf = outlines(shapely.box(0, 0, 10, 10), shapely.box(9, 0, 20, 10))
+    _, errors = check_outlines(gdf)
+    overlaps = errors[errors["error"] == "overlap"]
+    assert overlaps["area_m2"].tolist() == [10]
+
+
+def test_invalid_outline():
+    # Self-intersecting "bowtie" ring
+    bowtie = shapely.Polygon([(0, 0), (10, 10), (10, 0), (0, 10)])
+    gdf = outlines(bowtie, shapely.box(9, 1, 20, 9))
+    fixed, errors = check_outlines(gdf, fix_area=100)
+    assert (errors["error"] == "overlap").sum() == 1
+    assert len(fixed) == 2
@@ -0,0 +1,52 @@
+import geopandas as gpd
+import pandas as pd
+import shapely
+
+from calgary_osm.crs import PROJECTED_CRS
+from vertex_reduction import reduce_vertices
+
+
+def reduce(*geometries):
+    geometry = gpd.GeoSeries(list(geometries), crs=PROJECTED_CRS)
+    return reduce_vertices(geometry, pd.Series(["house"] * len(geometry)))
+
+
+def test_empty():
+    reduced = reduce()
+    assert reduced.empty
+    assert reduced.crs == PROJECTED_CRS
+
+
+def test_single_polygon():
+    # A duplicate node, a node in the middle of an edge and a corner that's
+    # off by a few centimeters
+    polygon = shapely.Polygon(
+        [(0, 0), (0.05, 0), (5, 0), (10, 0), (10, 10.05), (0, 10), (0, 0)]
+    )
+    (reduced,) = reduce(polygon)
+    assert shapely.get_num_coordinates(reduced) == 5
+    assert shapely.hausdorff_distance(reduced, shapely.box(0, 0, 10, 10)) < 0.1
+
+
+def test_multipolygon_and_hole():
+    with_hole = shapely.Polygon(
+        shapely.box(0, 0, 10, 10).exterior.coords,
+        [shapely.box(4, 4, 6, 6).exterior.coords],
+    )
+    multi = shapely.MultiPolygon([shapely.box(20, 0, 25, 5), shapely.box(30, 0, 35, 5)])
+    reduced = reduce(with_hole, multi)
+    assert reduced.geom_type.tolist() == ["Polygon", "MultiPolygon"]
+    assert shapely.equals_exact(
+        shapely.normalize(reduced.values), shapely.normalize([with_hole, multi]), 1e-9
+    ).all()
+
+
+def test_empty_polygons():
+    box = shapely.box(0, 0, 10, 10)
+    multi = shapely.MultiPolygon([shapely.box(20, 0, 25, 5), shapely.Polygon()])
+    reduced = reduce(box, shapely.Polygon(), multi, shapely.MultiPolygon(), box)
+    assert reduced.is_empty.tolist() == [False, True, False, True, False]
+    expected = [box, shapely.box(20, 0, 25, 5), box]
+    assert (
+        shapely.hausdorff_distance(reduced.values[[0, 2, 4]], expected) < 1e-9
+    ).all()